@@ -0,0 +1,35 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+# Mirrors the tasks.priority_rank generated column: lower ranks come first
+PRIORITY_RANKS = {"high": 0, "medium": 1, "low": 2}
+UNKNOWN_PRIORITY_RANK = 3
+
+
+def priority_rank(priority: Optional[str]) -> int:
+    """Encode a free-text priority as the sortable rank stored in tasks.priority_rank."""
+    return PRIORITY_RANKS.get(priority, UNKNOWN_PRIORITY_RANK)
+
+
+def agenda_cursor(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Keyset cursor pointing just after the given task, as agenda() parameters."""
+    return {
+        "p_after_rank": task.get("priority_rank", priority_rank(task.get("priority"))),
+        "p_after_due": task.get("due_date"),
+        "p_after_time": task.get("due_time"),
+        "p_after_created": task.get("created_at"),
+        "p_after_id": task["id"],
+    }
+
+
+def fetch_agenda(supabase, limit: int = 5,
+                 after: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Fetch the next page of actionable tasks from the agenda RPC.
+
+    Tasks come ordered by priority, then due date/time, then creation time.
+    Returns the page and a cursor for the following page, or None when there
+    are no more tasks. One extra row is requested to tell whether more exist.
+    """
+    rows = supabase.rpc("agenda", {"p_limit": limit + 1, **(after or {})}).execute().data
+    page = rows[:limit]
+    return page, agenda_cursor(page[-1]) if len(rows) > limit else None
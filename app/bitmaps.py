@@ -0,0 +1,152 @@
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+# One bit per day of the year, leap day included
+DAYS_PER_YEAR = 366
+BITMAP_BYTES = (DAYS_PER_YEAR + 7) // 8
+
+
+def day_index(day: date) -> int:
+    """Return the zero-based day-of-year used as the bit position for a date."""
+    return day.timetuple().tm_yday - 1
+
+
+def _decode_bytea(value: Union[str, bytes, bytearray, None]) -> bytearray:
+    """Decode a bytea value as returned by PostgREST (hex string) or a driver (bytes)."""
+    if value is None:
+        return bytearray(BITMAP_BYTES)
+    if isinstance(value, str):
+        if value.startswith("\\x"):
+            value = value[2:]
+        value = bytes.fromhex(value)
+    bits = bytearray(value)
+    if len(bits) < BITMAP_BYTES:
+        bits.extend(bytes(BITMAP_BYTES - len(bits)))
+    return bits
+
+
+class HabitBitmap:
+    """
+    Completion bitset for one habit over one calendar year.
+
+    Bit n is set when the habit was completed on day-of-year n + 1. Bits are
+    numbered from the least significant bit of each byte, which matches
+    Postgres get_bit/set_bit on the habit_bitmaps.bits column.
+    """
+
+    __slots__ = ("year", "bits")
+
+    def __init__(self, year: int, bits: Union[str, bytes, bytearray, None] = None):
+        self.year = year
+        self.bits = _decode_bytea(bits)
+
+    def _index(self, day: date) -> int:
+        if day.year != self.year:
+            raise ValueError(f"{day} is outside bitmap year {self.year}")
+        return day_index(day)
+
+    def is_set(self, day: date) -> bool:
+        """Check whether the habit was completed on the given day."""
+        i = self._index(day)
+        return bool(self.bits[i >> 3] & (1 << (i & 7)))
+
+    def set(self, day: date) -> None:
+        """Mark the habit as completed on the given day."""
+        i = self._index(day)
+        self.bits[i >> 3] |= 1 << (i & 7)
+
+    def clear(self, day: date) -> None:
+        """Unmark the habit on the given day."""
+        i = self._index(day)
+        self.bits[i >> 3] &= ~(1 << (i & 7)) & 0xFF
+
+    def as_int(self) -> int:
+        """Return the bitset as a single integer with bit n = day-of-year n + 1."""
+        return int.from_bytes(self.bits, "little")
+
+    def count(self, start: Optional[date] = None, end: Optional[date] = None) -> int:
+        """Count completions between start and end (inclusive), defaulting to the whole year."""
+        lo = self._index(start) if start else 0
+        hi = self._index(end) if end else DAYS_PER_YEAR - 1
+        if hi < lo:
+            return 0
+        mask = ((1 << (hi - lo + 1)) - 1) << lo
+        return (self.as_int() & mask).bit_count()
+
+    def completion_rate(self, start: Optional[date] = None, end: Optional[date] = None) -> float:
+        """Return the fraction of days between start and end (inclusive) with a completion."""
+        start = start or date(self.year, 1, 1)
+        end = end or date(self.year, 12, 31)
+        days = (end - start).days + 1
+        if days <= 0:
+            return 0.0
+        return self.count(start, end) / days
+
+    def run_ending_at(self, day: date) -> int:
+        """Length of the unbroken run of completions ending exactly on the given day."""
+        i = self._index(day)
+        window = (1 << (i + 1)) - 1
+        gaps = ~self.as_int() & window
+        if not gaps:
+            return i + 1
+        # The highest unset bit at or below i marks where the run starts
+        return i - (gaps.bit_length() - 1)
+
+    def current_streak(self, today: date, previous: Optional["HabitBitmap"] = None) -> int:
+        """
+        Return the current streak as of today.
+
+        A streak is still alive if today is not completed yet, so counting
+        starts from yesterday in that case. Pass the previous year's bitmap
+        to let streaks carry over January 1st.
+        """
+        day = today if self.is_set(today) else today - timedelta(days=1)
+        if day.year != self.year:
+            if previous is None or previous.year != day.year:
+                return 0
+            return previous.run_ending_at(day)
+
+        streak = self.run_ending_at(day)
+        if streak == day_index(day) + 1 and previous is not None:
+            streak += previous.run_ending_at(date(previous.year, 12, 31))
+        return streak
+
+    def longest_streak(self) -> int:
+        """Return the longest run of consecutive completions within the year."""
+        v = self.as_int()
+        longest = 0
+        while v:
+            v &= v >> 1
+            longest += 1
+        return longest
+
+    def heatmap(self) -> List[List[Optional[int]]]:
+        """
+        Return a weekday x week grid of completions for the year.
+
+        Rows are Monday..Sunday and columns are calendar weeks; cells outside
+        the year are None so the grid can be fed straight to a heatmap chart.
+        """
+        first = date(self.year, 1, 1)
+        last = date(self.year, 12, 31)
+        offset = first.weekday()
+        weeks = (offset + day_index(last) + 7) // 7
+        grid: List[List[Optional[int]]] = [[None] * weeks for _ in range(7)]
+        v = self.as_int()
+        for i in range(day_index(last) + 1):
+            cell = offset + i
+            grid[cell % 7][cell // 7] = (v >> i) & 1
+        return grid
+
+
+def load_bitmaps(supabase, user_id: str, years: Iterable[int]) -> Dict[Tuple[str, int], HabitBitmap]:
+    """Fetch the user's habit bitmaps for the given years, keyed by (habit_id, year)."""
+    rows = (
+        supabase.table("habit_bitmaps")
+        .select("habit_id, year, bits")
+        .eq("user_id", user_id)
+        .in_("year", list(years))
+        .execute()
+        .data
+    )
+    return {(r["habit_id"], r["year"]): HabitBitmap(r["year"], r["bits"]) for r in rows}
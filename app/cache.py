@@ -0,0 +1,287 @@
+import json
+import logging
+import os
+import sqlite3
+import stat
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Optional
+
+from .singleflight import single_flight
+
+logger = logging.getLogger(__name__)
+
+# Backend selection: "sqlite" (shared by every process on the host), "memory" (per process) or "none"
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "sqlite")
+# Defaults to a directory only the current OS user can read (see private_cache_path)
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH")
+SHARED_CACHE_TTL = int(os.getenv("SHARED_CACHE_TTL", "300"))  # seconds
+SHARED_CACHE_MMAP_BYTES = int(os.getenv("SHARED_CACHE_MMAP_BYTES", str(64 * 1024 * 1024)))
+
+
+def private_cache_path() -> str:
+    """
+    Default cache file location: inside a directory owned by and only
+    accessible to the current OS user.
+
+    The cache holds profiles (including roles) and habits, so other local
+    users must be able neither to read it nor to plant entries. Uses
+    XDG_RUNTIME_DIR when set, else a per-user directory in the system temp
+    directory, created with mode 0700. Workers of the same user share it.
+    Windows has no uids or mode bits; its temp directory is already per user.
+    """
+    if not hasattr(os, "getuid"):
+        directory = os.path.join(tempfile.gettempdir(), "zenith-cache")
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, "shared_cache.db")
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR")
+    if runtime_dir and os.path.isdir(runtime_dir):
+        directory = os.path.join(runtime_dir, "zenith")
+    else:
+        directory = os.path.join(tempfile.gettempdir(), f"zenith-cache-{os.getuid()}")
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(f"{directory} must be a directory owned by this user with mode 0700")
+    return os.path.join(directory, "shared_cache.db")
+
+
+class CacheBackend(ABC):
+    """
+    Storage interface for the shared cache.
+
+    Values are opaque bytes; namespace versions are integer counters that
+    every process reads, so bumping one invalidates the namespace for all
+    workers at once. A networked store (e.g. Redis) can implement the same
+    five methods.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def get_version(self, namespace: str) -> int:
+        ...
+
+    @abstractmethod
+    def bump_version(self, namespace: str) -> int:
+        ...
+
+
+class NullCacheBackend(CacheBackend):
+    """Backend that stores nothing; every lookup is a miss."""
+
+    def get(self, key: str) -> Optional[bytes]:
+        return None
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        pass
+
+    def delete(self, key: str) -> None:
+        pass
+
+    def get_version(self, namespace: str) -> int:
+        return 0
+
+    def bump_version(self, namespace: str) -> int:
+        return 0
+
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process backend, for single-worker deployments."""
+
+    def __init__(self):
+        self._entries: Dict[str, tuple] = {}
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get_version(self, namespace: str) -> int:
+        with self._lock:
+            return self._versions.get(namespace, 0)
+
+    def bump_version(self, namespace: str) -> int:
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+            return self._versions[namespace]
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Host-wide backend on a memory-mapped SQLite file in WAL mode.
+
+    Every Streamlit process on the host opens the same file, so a value
+    fetched by one worker is a hit for the others.
+    """
+
+    # Purge expired rows once every this many writes
+    PURGE_EVERY = 500
+
+    def __init__(self, path: Optional[str] = SHARED_CACHE_PATH, mmap_bytes: int = SHARED_CACHE_MMAP_BYTES):
+        self.path = path or private_cache_path()
+        self.mmap_bytes = mmap_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        # Create the file owner-only before SQLite opens it; the -wal and -shm files inherit its mode
+        os.close(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600))
+        os.chmod(self.path, 0o600)
+        conn = self._conn()
+        conn.execute("create table if not exists cache_entries (key text primary key, value blob, expires_at real)")
+        conn.execute("create table if not exists cache_versions (namespace text primary key, version integer not null)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections are not shared across threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("pragma journal_mode=wal")
+            conn.execute("pragma synchronous=normal")
+            conn.execute(f"pragma mmap_size={int(self.mmap_bytes)}")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._conn().execute(
+            "select value from cache_entries where key = ? and expires_at >= ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "insert or replace into cache_entries (key, value, expires_at) values (?, ?, ?)", (key, value, now + ttl)
+        )
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % self.PURGE_EVERY == 0
+        if purge:
+            conn.execute("delete from cache_entries where expires_at < ?", (now,))
+
+    def delete(self, key: str) -> None:
+        self._conn().execute("delete from cache_entries where key = ?", (key,))
+
+    def get_version(self, namespace: str) -> int:
+        row = self._conn().execute(
+            "select version from cache_versions where namespace = ?", (namespace,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def bump_version(self, namespace: str) -> int:
+        self._conn().execute(
+            "insert into cache_versions (namespace, version) values (?, 1) "
+            "on conflict (namespace) do update set version = version + 1",
+            (namespace,),
+        )
+        return self.get_version(namespace)
+
+
+class SharedCache:
+    """
+    Versioned read-through cache for Supabase query results.
+
+    Keys live under a namespace (e.g. "habits:<user_id>") whose version is
+    part of the stored key. Writers call invalidate(namespace), which bumps
+    the version in the backend; every process then misses on the old key and
+    refetches once, so invalidation is broadcast without messaging.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: int = SHARED_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{namespace}:v{self.backend.get_version(namespace)}:{key}"
+
+    def get_or_fetch(self, namespace: str, key: str, fetch: Callable[[], Any], ttl: Optional[int] = None) -> Any:
+        """Return the cached value, calling fetch() and storing its result on a miss."""
+        try:
+            full_key = self._key(namespace, key)
+            raw = self.backend.get(full_key)
+        except sqlite3.Error:
+            full_key, raw = None, None
+        if raw is not None:
+            self.hits += 1
+            return json.loads(raw)
+
+        self.misses += 1
+        # Concurrent misses for the same key (namespaces embed the user id) share one fetch and one store
+        return single_flight.do(("cache", namespace, key), lambda: self._fetch_and_store(full_key, fetch, ttl))
+
+    def _fetch_and_store(self, full_key: Optional[str], fetch: Callable[[], Any], ttl: Optional[int]) -> Any:
+        value = fetch()
+        if full_key is None:
+            return value
+        try:
+            self.backend.set(full_key, json.dumps(value, default=str).encode("utf-8"), ttl or self.ttl)
+        except sqlite3.Error:
+            # A busy or unavailable cache must never break the page
+            pass
+        return value
+
+    def invalidate(self, namespace: str) -> None:
+        """Drop every key in the namespace, for all processes sharing the backend."""
+        try:
+            self.backend.bump_version(namespace)
+        except sqlite3.Error:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def create_backend(name: str = CACHE_BACKEND) -> CacheBackend:
+    """Build the backend selected by CACHE_BACKEND."""
+    if name == "sqlite":
+        try:
+            return SQLiteCacheBackend()
+        except (OSError, sqlite3.Error) as e:
+            # Runs at import, so an unusable cache directory must not stop the app from starting
+            logger.warning("Shared cache unavailable (%s); falling back to a per-process cache", e)
+            return MemoryCacheBackend()
+    if name == "memory":
+        return MemoryCacheBackend()
+    if name == "none":
+        return NullCacheBackend()
+    raise ValueError(f"Unknown CACHE_BACKEND: {name}")
+
+
+shared_cache = SharedCache(create_backend())
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Sequence
+
+import plotly.express as px
+import plotly.graph_objects as go
+
+# Number of built figures kept per process
+FIGURE_CACHE_SIZE = int(os.getenv("FIGURE_CACHE_SIZE", "256"))
+
+CHART_TEMPLATES = {"dark": "plotly_dark", "light": "plotly_white"}
+
+
+def content_hash(kind: str, payload: Dict[str, Any]) -> str:
+    """Stable hash of a chart kind and its inputs (data, labels, theme)."""
+    encoded = json.dumps({"kind": kind, **payload}, sort_keys=True, default=str)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+class FigureCache:
+    """
+    Thread-safe LRU cache of Plotly figures keyed by a content hash.
+
+    It saves building the figure (plotly express and trace validation) when
+    the inputs are unchanged. st.plotly_chart still serializes the figure on
+    every rerun. Figures are shared across sessions, so callers must treat
+    them as read-only.
+    """
+
+    def __init__(self, maxsize: int = FIGURE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, go.Figure]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, kind: str, payload: Dict[str, Any], builder: Callable[[], go.Figure]) -> go.Figure:
+        """Return the cached figure for these inputs, building it on a miss."""
+        key = content_hash(kind, payload)
+        with self._lock:
+            fig = self._entries.get(key)
+            if fig is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return fig
+            self.misses += 1
+
+        fig = builder()
+
+        with self._lock:
+            self._entries[key] = fig
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return fig
+
+    def stats(self) -> Dict[str, int]:
+        """Entry count and hit/miss counters of the cache."""
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+figure_cache = FigureCache()
+
+
+def status_donut(values: Sequence[int], labels: Sequence[str], colors: Sequence[str], theme: str) -> go.Figure:
+    """Task status donut chart."""
+    payload = {"values": list(values), "labels": list(labels), "colors": list(colors), "theme": theme}
+
+    def build() -> go.Figure:
+        fig = px.pie(values=payload["values"], names=payload["labels"], hole=0.6,
+                     color_discrete_sequence=payload["colors"])
+        fig.update_layout(showlegend=True, margin=dict(l=20, r=20, t=20, b=20),
+                          template=CHART_TEMPLATES.get(theme, "plotly_white"))
+        return fig
+
+    return figure_cache.get_or_build("status_donut", payload, build)
+
+
+def activity_bar(x: List[str], y: List[int], title: str, theme: str, color: str = "#3b82f6") -> go.Figure:
+    """Single-series bar chart, e.g. habit activity per day."""
+    payload = {"x": list(x), "y": list(y), "title": title, "color": color, "theme": theme}
+
+    def build() -> go.Figure:
+        fig = go.Figure(data=[go.Bar(x=payload["x"], y=payload["y"], marker_color=color)])
+        fig.update_layout(title=title, margin=dict(l=20, r=20, t=40, b=20),
+                          template=CHART_TEMPLATES.get(theme, "plotly_white"))
+        return fig
+
+    return figure_cache.get_or_build("activity_bar", payload, build)
@@ -1,8 +1,11 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.pool import QueuePool, StaticPool
+from sqlalchemy.pool import NullPool, QueuePool, StaticPool
 import os
-from typing import Generator
+import threading
+import time
+from typing import Any, Dict, Generator, List, Optional
 
 import streamlit as st
 from dotenv import load_dotenv
@@ -30,26 +33,176 @@ if not DATABASE_URL:
 if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-# Configure engine based on database type
-if "sqlite" in DATABASE_URL:
-    # SQLite configuration
-    engine = create_engine(
-        DATABASE_URL,
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-        echo=False
-    )
-else:
-    # PostgreSQL configuration with connection pooling
-    engine = create_engine(
-        DATABASE_URL,
-        poolclass=QueuePool,
-        pool_size=10,
-        max_overflow=20,
-        pool_pre_ping=True,
-        pool_recycle=3600,
-        echo=False
-    )
+# Client-side pool for direct connections. Ignored behind the transaction
+# pooler, which does the pooling itself.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+
+# Supabase's transaction pooler (Supavisor) listens on 6543; 5432 is a
+# direct or session-mode connection that keeps one server connection per
+# client connection.
+TRANSACTION_POOLER_PORT = 6543
+
+
+def uses_transaction_pooler(url) -> bool:
+    """Whether a Postgres URL goes through a transaction-mode pooler (Supavisor or PgBouncer)."""
+    url = make_url(url)
+    return url.port == TRANSACTION_POOLER_PORT or url.query.get("pgbouncer") == "true"
+
+
+def _pooler_connect_args(driver: str) -> Dict[str, Any]:
+    """
+    Driver settings for transaction mode.
+
+    Consecutive transactions may run on different server connections, so
+    server-side prepared statements must be off. psycopg2 and pg8000 don't
+    keep named prepared statements; psycopg 3 does once a query has run
+    prepare_threshold times.
+    """
+    if driver == "psycopg":
+        return {"prepare_threshold": None}
+    return {}
+
+
+class PoolMetrics:
+    """
+    Connection pool counters, fed by SQLAlchemy pool events and by the
+    instrumented pool classes below.
+
+    wait is the time a checkout spent in the pool: waiting for a free
+    connection or, when none is idle, opening a new one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.connects = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def attach(self, engine: Engine) -> "PoolMetrics":
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        engine.pool.metrics = self
+        return self
+
+    def _on_connect(self, dbapi_connection, connection_record) -> None:
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def _on_checkin(self, dbapi_connection, connection_record) -> None:
+        with self._lock:
+            self.in_use -= 1
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def stats(self, pool=None) -> Dict[str, Any]:
+        with self._lock:
+            stats = {
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "wait_avg_ms": self.wait_total / self.checkouts * 1000 if self.checkouts else 0.0,
+                "wait_max_ms": self.wait_max * 1000,
+            }
+        if isinstance(pool, QueuePool):
+            stats.update(pool_size=pool.size(), idle=pool.checkedin(), overflow=max(pool.overflow(), 0))
+        return stats
+
+
+class _TimedCheckout:
+    """Times Pool._do_get, the part of a checkout that waits for a connection."""
+
+    metrics: Optional[PoolMetrics] = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            if self.metrics is not None:
+                self.metrics.record_wait(time.perf_counter() - started)
+
+    def recreate(self):
+        # dispose() and invalidation replace the pool; keep counting into the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class InstrumentedNullPool(_TimedCheckout, NullPool):
+    pass
+
+
+def create_app_engine(url: str, pooling: str = "auto") -> Engine:
+    """
+    Create an engine configured for the kind of database URL.
+
+    SQLite gets a single shared connection. Postgres behind a transaction
+    pooler gets NullPool, since a second pool in front of the pooler only
+    holds server slots idle, plus prepared statements disabled. Direct
+    Postgres connections get a QueuePool. pooling ("auto", "queue" or
+    "null") overrides the choice, for benchmarking. The engine's pool
+    metrics are available from pool_stats().
+    """
+    if "sqlite" in url:
+        return create_engine(
+            url,
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+            echo=False
+        )
+
+    parsed = make_url(url)
+    pooler = uses_transaction_pooler(parsed)
+    # pgbouncer=true is a marker for us, not a libpq option
+    parsed = parsed.difference_update_query(["pgbouncer"])
+    connect_args = _pooler_connect_args(parsed.get_driver_name()) if pooler else {}
+    if pooling == "null" or (pooling == "auto" and pooler):
+        engine = create_engine(parsed, poolclass=InstrumentedNullPool, connect_args=connect_args, echo=False)
+    else:
+        engine = create_engine(
+            parsed,
+            poolclass=InstrumentedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_pre_ping=True,
+            pool_recycle=3600,
+            connect_args=connect_args,
+            echo=False
+        )
+    PoolMetrics().attach(engine)
+    return engine
+
+
+def pool_stats(bind: Optional[Engine] = None) -> Dict[str, Any]:
+    """Pool configuration and metrics for an engine (default: the app's)."""
+    bind = bind or engine
+    metrics = getattr(bind.pool, "metrics", None)
+    stats = {"pool": type(bind.pool).__name__, "status": bind.pool.status()}
+    if metrics is not None:
+        stats.update(metrics.stats(bind.pool))
+    return stats
+
+
+engine = create_app_engine(DATABASE_URL)
 
 # Create session factory
 SessionLocal = sessionmaker(
@@ -74,9 +227,44 @@ def get_db() -> Generator:
         db.close()
 
 
+def upgrade_sqlite_schema(bind: Engine) -> List[str]:
+    """
+    Add model columns and indexes missing from existing SQLite tables.
+
+    create_all() only creates missing tables, so a database file from an
+    older version lacks columns added to the models since. Idempotent;
+    returns the "table.column" names it added. Added columns must be
+    nullable, as existing rows get NULL (or the generated value).
+    """
+    inspector = inspect(bind)
+    added = []
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"{column.name} {column.type.compile(dialect=bind.dialect)}"
+                if column.computed is not None:
+                    # SQLite can only add VIRTUAL generated columns; they read the same as STORED ones
+                    ddl += f" GENERATED ALWAYS AS ({column.computed.sqltext}) VIRTUAL"
+                conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+                added.append(f"{table.name}.{column.name}")
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+    return added
+
+
 def init_db() -> None:
     """
     Initialize database tables.
-    Creates all tables defined in models.
+    Creates all tables defined in models, plus the FTS5 search index on SQLite.
+    On SQLite, also adds columns that models gained since the file was created.
     """
     Base.metadata.create_all(bind=engine)
+    if "sqlite" in DATABASE_URL:
+        upgrade_sqlite_schema(engine)
+        from .search import init_sqlite_search
+        init_sqlite_search(engine)
@@ -0,0 +1,250 @@
+"""
+Weekly insight reports, precomputed off the interactive path.
+
+For every user, summarizes one ISO week from raw habits, habit_logs,
+tasks and task_occurrences: habit consistency against target_count, the best weekday for habits
+over the last LOOKBACK_WEEKS weeks, task throughput against the week before
+(one-off tasks plus completed occurrences of recurring ones),
+and the number of overdue tasks at the end of each recent week. Reports are
+upserted into weekly_insights keyed by (user_id, iso_week); the dashboard
+reads the latest one (see fetch_latest_insights).
+
+Users are processed in batches. The parent process fetches each batch's rows
+and a process pool computes the reports, so the pandas work spreads across
+cores while the next batch is being fetched. Run it weekly, e.g. Monday
+morning for the week that just ended:
+
+    SUPABASE_URL=... SUPABASE_SERVICE_KEY=... python -m app.insights --workers 4
+"""
+import argparse
+import calendar
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+import pandas as pd
+
+INSIGHTS_BATCH_SIZE = int(os.getenv("INSIGHTS_BATCH_SIZE", "100"))  # users per batch
+LOOKBACK_WEEKS = 4
+# PostgREST caps responses at 1000 rows by default, so larger reads are paged
+FETCH_PAGE_SIZE = 1000
+
+
+def iso_week_key(day: date) -> str:
+    """The weekly_insights key of the ISO week containing day, e.g. '2026-W42'."""
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def week_start(key: str) -> date:
+    """Monday of the ISO week named by iso_week_key()."""
+    return datetime.strptime(key + "-1", "%G-W%V-%u").date()
+
+
+def _expected_per_week(frequency: pd.Series, target: pd.Series, week_monday: date) -> pd.Series:
+    """Completions a habit's target asks for in one week."""
+    days_in_month = calendar.monthrange(week_monday.year, week_monday.month)[1]
+    per_period = {"daily": 7.0, "weekly": 1.0, "monthly": 7.0 / days_in_month}
+    return frequency.map(lambda f: per_period.get(f, 7.0)) * target
+
+
+def compute_reports(user_ids: List[str], habits: List[Dict[str, Any]], logs: List[Dict[str, Any]],
+                    tasks: List[Dict[str, Any]], occurrences: List[Dict[str, Any]],
+                    week_monday: date) -> Dict[str, Dict[str, Any]]:
+    """
+    Build the reports of one batch of users; runs in a worker process.
+
+    habits, logs, tasks and occurrences are the batch's raw rows (see
+    fetch_batch). All figures are computed per user with group-bys over the
+    whole batch.
+    """
+    # Dates are compared as day-resolution timestamps, so missing values are NaT and never match
+    monday = pd.Timestamp(week_monday)
+    week_end = monday + pd.Timedelta(days=6)
+    lookback_start = monday - pd.Timedelta(weeks=LOOKBACK_WEEKS - 1)
+    users = pd.Index(user_ids, name="user_id")
+
+    habits_df = pd.DataFrame(habits, columns=["id", "user_id", "frequency", "target_count"])
+    logs_df = pd.DataFrame(logs, columns=["habit_id", "user_id", "completed_date"])
+    logs_df["completed_date"] = pd.to_datetime(logs_df["completed_date"])
+
+    # Habit consistency: completions this week against each habit's weekly target, capped per habit
+    in_week = logs_df[(logs_df["completed_date"] >= monday) & (logs_df["completed_date"] <= week_end)]
+    habits_df["done"] = habits_df["id"].map(in_week.groupby("habit_id").size()).fillna(0)
+    habits_df["expected"] = _expected_per_week(habits_df["frequency"],
+                                               habits_df["target_count"].fillna(1).clip(lower=1), week_monday)
+    habits_df["credited"] = habits_df[["done", "expected"]].min(axis=1)
+    per_user = habits_df.groupby("user_id")[["done", "expected", "credited"]].sum().reindex(users, fill_value=0)
+
+    # Best weekday over the lookback window
+    recent = logs_df[logs_df["completed_date"] >= lookback_start].copy()
+    recent["weekday"] = recent["completed_date"].dt.weekday
+    by_weekday = recent.groupby(["user_id", "weekday"]).size()
+    best_weekday = by_weekday.groupby(level="user_id").idxmax().map(lambda pair: calendar.day_name[pair[1]])
+
+    # Task throughput, and overdue counts as of the end of each lookback week
+    def days(values: pd.Series) -> pd.Series:
+        return pd.to_datetime(values, utc=True, format="ISO8601").dt.tz_localize(None).dt.normalize()
+
+    tasks_df = pd.DataFrame(tasks, columns=["id", "user_id", "status", "due_date", "created_at", "completed_at"])
+    tasks_df["due_date"] = pd.to_datetime(tasks_df["due_date"])
+    for column in ("created_at", "completed_at"):
+        tasks_df[column] = days(tasks_df[column])
+    # Recurring templates are never completed themselves; each completed occurrence counts as one task
+    occurrences_df = pd.DataFrame(occurrences, columns=["user_id", "completed_at"])
+    completions = pd.concat([tasks_df[["user_id", "completed_at"]],
+                             occurrences_df.assign(completed_at=days(occurrences_df["completed_at"]))])
+
+    def count_between(frame: pd.DataFrame, column: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.Series:
+        hits = frame[(frame[column] >= start) & (frame[column] <= end)]
+        return hits.groupby("user_id").size().reindex(users, fill_value=0)
+
+    completed_week = count_between(completions, "completed_at", monday, week_end)
+    completed_prev = count_between(completions, "completed_at", monday - pd.Timedelta(days=7),
+                                   monday - pd.Timedelta(days=1))
+    created_week = count_between(tasks_df, "created_at", monday, week_end)
+
+    overdue_trend = []
+    for weeks_back in range(LOOKBACK_WEEKS - 1, -1, -1):
+        as_of = week_end - pd.Timedelta(weeks=weeks_back)
+        still_open = (tasks_df["completed_at"].isna() & (tasks_df["status"] != "completed")) \
+            | (tasks_df["completed_at"] > as_of)
+        existed = tasks_df["created_at"].isna() | (tasks_df["created_at"] <= as_of)
+        overdue = tasks_df[(tasks_df["due_date"] <= as_of) & still_open & existed]
+        overdue_trend.append(overdue.groupby("user_id").size().reindex(users, fill_value=0))
+
+    week = iso_week_key(week_monday)
+    reports = {}
+    for user_id in user_ids:
+        row = per_user.loc[user_id]
+        reports[user_id] = {
+            "week": week,
+            "habits": {
+                "done": int(row["done"]),
+                "expected": round(float(row["expected"]), 1),
+                "consistency": round(float(row["credited"] / row["expected"]), 3) if row["expected"] else None,
+                "best_weekday": best_weekday.get(user_id),
+            },
+            "tasks": {
+                "completed": int(completed_week[user_id]),
+                "completed_prev": int(completed_prev[user_id]),
+                "created": int(created_week[user_id]),
+                "per_day": round(int(completed_week[user_id]) / 7, 2),
+            },
+            "overdue_trend": [int(series[user_id]) for series in overdue_trend],
+        }
+    return reports
+
+
+def _fetch_all(build: Callable[[], Any]) -> List[Dict[str, Any]]:
+    """Run a PostgREST query page by page; build() must return a fresh, ordered query."""
+    rows: List[Dict[str, Any]] = []
+    while True:
+        page = build().range(len(rows), len(rows) + FETCH_PAGE_SIZE - 1).execute().data
+        rows += page
+        if len(page) < FETCH_PAGE_SIZE:
+            return rows
+
+
+def iter_user_batches(supabase, batch_size: int = INSIGHTS_BATCH_SIZE) -> Iterator[List[str]]:
+    """Every user id, in keyset-paginated batches."""
+    last = None
+    while True:
+        query = supabase.table("users").select("id").order("id").limit(batch_size)
+        if last is not None:
+            query = query.gt("id", last)
+        ids = [r["id"] for r in query.execute().data]
+        if ids:
+            yield ids
+        if len(ids) < batch_size:
+            return
+        last = ids[-1]
+
+
+def fetch_batch(supabase, user_ids: List[str], week_monday: date) -> Dict[str, List[Dict[str, Any]]]:
+    """Raw rows compute_reports() needs for a batch of users."""
+    week_end = (week_monday + timedelta(days=6)).isoformat()
+    lookback_start = (week_monday - timedelta(weeks=LOOKBACK_WEEKS)).isoformat()
+    task_columns = "id, user_id, status, due_date, created_at, completed_at"
+
+    def tasks(completed_filter: Callable[[Any], Any]) -> List[Dict[str, Any]]:
+        return _fetch_all(lambda: completed_filter(
+            supabase.table("tasks").select(task_columns).in_("user_id", user_ids).is_("recurrence_rule", "null")
+        ).order("id"))
+
+    return {
+        "habits": _fetch_all(lambda: supabase.table("habits").select("id, user_id, frequency, target_count")
+                             .in_("user_id", user_ids).order("id")),
+        "logs": _fetch_all(lambda: supabase.table("habit_logs").select("habit_id, user_id, completed_date")
+                           .in_("user_id", user_ids).gte("completed_date", lookback_start)
+                           .lte("completed_date", week_end).order("id")),
+        # Open tasks plus those completed within the lookback cover every figure in the report
+        "tasks": tasks(lambda q: q.is_("completed_at", "null"))
+                 + tasks(lambda q: q.gte("completed_at", lookback_start)),
+        "occurrences": _fetch_all(lambda: supabase.table("task_occurrences").select("user_id, completed_at")
+                                  .in_("user_id", user_ids).gte("completed_at", lookback_start)
+                                  .order("task_id").order("occurrence_date")),
+    }
+
+
+def store_reports(supabase, reports: Dict[str, Dict[str, Any]]) -> int:
+    if not reports:
+        return 0
+    rows = [{"user_id": user_id, "iso_week": report["week"], "report": report,
+             "computed_at": datetime.now(timezone.utc).isoformat(timespec="seconds")} for user_id, report in reports.items()]
+    supabase.table("weekly_insights").upsert(rows, on_conflict="user_id,iso_week").execute()
+    return len(rows)
+
+
+def run(supabase, week_monday: date, workers: Optional[int] = None,
+        batch_size: int = INSIGHTS_BATCH_SIZE) -> int:
+    """Compute and store the reports of every user for one week; returns the number written."""
+    workers = workers or os.cpu_count() or 1
+    written = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: Set[Future] = set()
+        for user_ids in iter_user_batches(supabase, batch_size):
+            batch = fetch_batch(supabase, user_ids, week_monday)
+            pending.add(pool.submit(compute_reports, user_ids, batch["habits"], batch["logs"], batch["tasks"],
+                                    batch["occurrences"], week_monday))
+            # Bound the batches held in memory while workers catch up
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                written += sum(store_reports(supabase, f.result()) for f in done)
+        written += sum(store_reports(supabase, f.result()) for f in wait(pending).done)
+    return written
+
+
+def fetch_latest_insights(supabase, user_id: str) -> Optional[Dict[str, Any]]:
+    """The user's most recent weekly report, or None before the first run."""
+    rows = (
+        supabase.table("weekly_insights")
+        .select("iso_week, report")
+        .eq("user_id", user_id)
+        .order("iso_week", desc=True)
+        .limit(1)
+        .execute()
+        .data
+    )
+    return rows[0]["report"] if rows else None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from .reminder_worker import create_service_client
+
+    last_week = iso_week_key(date.today() - timedelta(days=7))
+    parser = argparse.ArgumentParser(description="Compute weekly insight reports for all users.")
+    parser.add_argument("--week", default=last_week, help="ISO week to report on (default: last week, %(default)s)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--batch-size", type=int, default=INSIGHTS_BATCH_SIZE, help="users per batch")
+    args = parser.parse_args(argv)
+
+    started = time.monotonic()
+    written = run(create_service_client(), week_start(args.week), args.workers, args.batch_size)
+    print(f"{args.week}: wrote {written} reports in {time.monotonic() - started:.1f}s", flush=True)
+
+
+if __name__ == "__main__":
+    main()
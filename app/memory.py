@@ -0,0 +1,194 @@
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+SESSION_MEMORY_BUDGET = int(float(os.getenv("SESSION_MEMORY_BUDGET_MB", "32")) * 1024 * 1024)
+GLOBAL_MEMORY_BUDGET = int(float(os.getenv("GLOBAL_MEMORY_BUDGET_MB", "512")) * 1024 * 1024)
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", "1800"))  # seconds
+# Re-measuring walks the whole session state, so do it at most this often per session
+MEASURE_INTERVAL = float(os.getenv("SESSION_MEASURE_INTERVAL", "5"))
+
+
+def deep_sizeof(obj: Any, _seen: Optional[set] = None) -> int:
+    """Approximate bytes held by an object graph, counting shared objects once."""
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    memory_usage = getattr(obj, "memory_usage", None)
+    if callable(memory_usage) and hasattr(obj, "columns"):
+        # pandas DataFrame: its buffers are invisible to sys.getsizeof
+        try:
+            return int(memory_usage(deep=True).sum())
+        except TypeError:
+            pass
+
+    size = sys.getsizeof(obj, 0)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+        return size
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+class SessionRecord:
+    """
+    What one browser session holds, as of its last measurement.
+
+    Data the pages can reload (table syncs, the agenda) lives in `store`
+    rather than in st.session_state, so the accountant can drop it from any
+    thread. Everything in session state (login, widget values, preferences)
+    is counted but never evicted.
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.user: Optional[str] = None
+        self.last_seen = time.time()
+        self.measured_at = 0.0
+        self.sizes: Dict[str, int] = {}
+        self.store: Dict[str, Any] = {}
+        self.evictions = 0
+
+    @property
+    def alive(self) -> bool:
+        """False once Streamlit has dropped the session; outside a server (e.g. AppTest) always True."""
+        return not Runtime.exists() or Runtime.instance().is_active_session(self.session_id)
+
+    @property
+    def total(self) -> int:
+        return sum(self.sizes.values())
+
+    def measure(self, state) -> None:
+        """Measure from the session's own thread; state is its st.session_state."""
+        seen: set = set()
+        sizes = {key: deep_sizeof(value, seen) for key, value in state.filtered_state.items()}
+        # list() takes a snapshot, so an eviction from another thread can't break the walk
+        for key, value in list(self.store.items()):
+            sizes[key] = deep_sizeof(value, seen)
+        self.sizes = sizes
+        self.measured_at = time.time()
+
+    def evict_until(self, budget: int) -> int:
+        """Drop the largest stored entries until the session is within budget; returns the bytes released."""
+        freed = 0
+        for key in sorted(list(self.store), key=lambda k: -self.sizes.get(k, 0)):
+            if self.total <= budget:
+                break
+            self.store.pop(key, None)
+            freed += self.sizes.pop(key, 0)
+            self.evictions += 1
+        return freed
+
+
+class MemoryAccountant:
+    """
+    Tracks the memory held by every session (its st.session_state and its
+    store of reloadable data) and keeps it within a per-session and a
+    process-wide budget.
+
+    account() runs at the end of each rerun. It re-measures the session,
+    evicts its largest stored entries when it is over the per-session budget,
+    drops the stores of sessions idle longer than SESSION_IDLE_TIMEOUT and,
+    when the total is still over the global budget, empties the stores of
+    the least recently seen sessions first. Evicted entries are rebuilt by
+    the pages on their next run.
+    """
+
+    def __init__(self, session_budget: int = SESSION_MEMORY_BUDGET, global_budget: int = GLOBAL_MEMORY_BUDGET,
+                 idle_timeout: float = SESSION_IDLE_TIMEOUT):
+        self.session_budget = session_budget
+        self.global_budget = global_budget
+        self.idle_timeout = idle_timeout
+        self._records: Dict[str, SessionRecord] = {}
+        self._lock = threading.Lock()
+        self.freed = 0
+
+    def _record(self, session_id: str) -> SessionRecord:
+        # Keyed on the session id, which is stable across runs; the records hold no session objects
+        record = self._records.get(session_id)
+        if record is None:
+            record = self._records[session_id] = SessionRecord(session_id)
+        return record
+
+    def store(self) -> Dict[str, Any]:
+        """
+        The current session's evictable data. Entries may vanish between runs,
+        so callers must rebuild whatever they find missing.
+        """
+        ctx = get_script_run_ctx()
+        if ctx is None:
+            return {}
+        with self._lock:
+            return self._record(ctx.session_id).store
+
+    def account(self, user: Optional[str] = None) -> None:
+        ctx = get_script_run_ctx()
+        if ctx is None:
+            return
+        now = time.time()
+        with self._lock:
+            record = self._record(ctx.session_id)
+            record.user = user
+            record.last_seen = now
+        # Measuring only reads this session's own data, so other sessions needn't wait for it
+        if now - record.measured_at >= MEASURE_INTERVAL:
+            record.measure(ctx.session_state)
+        with self._lock:
+            self.freed += record.evict_until(self.session_budget)
+
+            for session_id, other in list(self._records.items()):
+                if not other.alive:
+                    del self._records[session_id]
+                elif other is not record and now - other.last_seen > self.idle_timeout:
+                    self.freed += other.evict_until(0)
+
+            excess = self.total() - self.global_budget
+            if excess > 0:
+                for other in sorted(self._records.values(), key=lambda r: r.last_seen):
+                    if excess <= 0:
+                        break
+                    freed = other.evict_until(0)
+                    self.freed += freed
+                    excess -= freed
+
+    def total(self) -> int:
+        return sum(r.total for r in self._records.values())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self._records),
+                "total_bytes": self.total(),
+                "session_budget": self.session_budget,
+                "global_budget": self.global_budget,
+                "freed_bytes": self.freed,
+                "evictions": sum(r.evictions for r in self._records.values()),
+            }
+
+    def sessions(self) -> List[Dict[str, Any]]:
+        """Per-session breakdown, largest first."""
+        now = time.time()
+        with self._lock:
+            rows = [{
+                "session": r.session_id[:8],
+                "user": r.user or "-",
+                "idle_s": round(now - r.last_seen),
+                "bytes": r.total,
+                "largest": ", ".join(sorted(r.sizes, key=lambda k: -r.sizes[k])[:3]),
+                "evictions": r.evictions,
+            } for r in self._records.values()]
+        return sorted(rows, key=lambda row: -row["bytes"])
+
+
+memory_accountant = MemoryAccountant()
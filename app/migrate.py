@@ -0,0 +1,507 @@
+"""
+Bulk data migration between the local SQLite schema (app/models.py) and the
+Supabase schema (supabase_setup.sql), in either direction.
+
+    python -m app.migrate to-supabase --sqlite sqlite:///./habit_tracker.db --postgres "$SUPABASE_DB_URL"
+    python -m app.migrate to-sqlite --sqlite sqlite:///./habit_tracker.db --postgres "$SUPABASE_DB_URL" --user me@example.com
+
+Rows are streamed in keyset-ordered batches. Postgres is written with COPY
+into a temporary table followed by one INSERT ... ON CONFLICT DO NOTHING, and
+SQLite with executemany, so re-running a batch is harmless. After every
+batch the last key copied is saved to a JSON checkpoint file, and a restarted
+run resumes from there. Tables that don't depend on each other are copied
+concurrently.
+
+A SQLite file from an older version may lack newer tables and columns.
+When reading from it, missing columns are copied as NULL and missing tables
+are skipped; when writing to it, its schema is upgraded first (see
+app.database.upgrade_sqlite_schema). Rows whose parent row was not copied
+(for example a check-in of another user's habit) are skipped and counted.
+
+Users are matched by email. Supabase user ids belong to Supabase Auth, so
+when copying to Supabase only users who have already signed up there are
+migrated. Local users created when copying to SQLite get an unusable
+password and must reset it.
+
+Ids are mapped as follows. SQLite integer ids become deterministic uuid5
+values, so children find their parents without a lookup. Supabase UUIDs get
+new SQLite integer ids, recorded in a migration_id_map table in the SQLite
+database.
+
+The Postgres connection needs psycopg2 and a direct database URL (not the
+REST API). It bypasses RLS, so use it only from a trusted machine.
+"""
+import argparse
+import io
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time as dtime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
+
+from sqlalchemy import create_engine, text
+
+# Fixed namespace: the same SQLite row always maps to the same Supabase UUID
+MIGRATION_NAMESPACE = uuid.UUID("8872d8a6-d769-4031-9e3b-da3a7631abf1")
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_CHECKPOINT = "migration_checkpoint.json"
+
+
+class TableMapping:
+    """
+    How one table is laid out on each side.
+
+    columns maps each Supabase column to the SQLite expression that reads it
+    (None if SQLite has no such column). Columns listed in sqlite_readonly
+    come from a join and are not written back to SQLite. references maps a
+    foreign key column to the table it points at. defaults fills NULLs in
+    columns that are NOT NULL or defaulted on the Supabase side.
+    """
+
+    def __init__(self, name: str, sqlite_table: str, columns: Dict[str, Optional[str]], level: int,
+                 key: Sequence[str] = ("id",), sqlite_from: Optional[str] = None,
+                 sqlite_readonly: Sequence[str] = (), references: Optional[Dict[str, str]] = None,
+                 defaults: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.sqlite_table = sqlite_table
+        self.columns = columns
+        self.level = level
+        self.key = tuple(key)
+        self.sqlite_from = sqlite_from or sqlite_table
+        self.sqlite_readonly = set(sqlite_readonly)
+        self.references = {"user_id": "users", **(references or {})}
+        self.defaults = defaults or {}
+
+    @property
+    def has_id(self) -> bool:
+        return "id" in self.columns
+
+    def shared_columns(self) -> List[str]:
+        """Columns present on both sides."""
+        return [c for c, expr in self.columns.items() if expr is not None]
+
+    def sqlite_column(self, column: str) -> str:
+        return self.columns[column].split(".")[-1]
+
+
+# Supabase name -> mapping. level decides ordering: a table is copied only
+# after every table it references.
+MAPPINGS = [
+    TableMapping("categories", "task_categories", {
+        "id": "id", "name": "name", "user_id": "user_id",
+    }, level=1),
+    TableMapping("habits", "habits", {
+        "id": "id", "name": "title", "frequency": "frequency", "target_count": "target_count",
+        "reminder_time": None, "user_id": "user_id",
+    }, level=1, defaults={"target_count": 1}),
+    TableMapping("tasks", "tasks", {
+        "id": "id", "title": "title", "description": "description", "due_date": "due_date",
+        "due_time": "due_time", "priority": "priority", "status": "status", "user_id": "user_id",
+        "category_id": "category_id", "created_at": "created_at", "completed_at": "completed_at",
+        "recurrence_rule": "recurrence_rule",
+    }, level=2, references={"category_id": "categories"}),
+    TableMapping("habit_logs", "habit_entries", {
+        "id": "e.id", "habit_id": "e.habit_id", "completed_date": "e.date", "user_id": "h.user_id",
+    }, level=2, sqlite_from="habit_entries e join habits h on h.id = e.habit_id",
+        sqlite_readonly=["user_id"], references={"habit_id": "habits"}),
+    TableMapping("task_occurrences", "task_occurrences", {
+        "task_id": "o.task_id", "occurrence_date": "o.occurrence_date", "status": "o.status",
+        "completed_at": "o.completed_at", "user_id": "t.user_id",
+    }, level=3, key=("task_id", "occurrence_date"), sqlite_from="task_occurrences o join tasks t on t.id = o.task_id",
+        sqlite_readonly=["user_id"], references={"task_id": "tasks"}),
+]
+
+
+def supabase_id(table: str, sqlite_id: Any) -> str:
+    """Deterministic UUID for a SQLite row."""
+    return str(uuid.uuid5(MIGRATION_NAMESPACE, f"{table}:{sqlite_id}"))
+
+
+def _sqlite_value(value: Any) -> Any:
+    """Format driver values the way SQLAlchemy stores them in SQLite."""
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, dtime):
+        return value.strftime("%H:%M:%S.%f")
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def _csv_field(value: Any) -> str:
+    """
+    One field for COPY ... (format csv).
+
+    COPY reads only an unquoted empty field as NULL, so None is written bare
+    and every other value is quoted, which keeps '' an empty string.
+    """
+    if value is None:
+        return ""
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+class SQLiteSide:
+    """Reads and writes the SQLAlchemy schema in a SQLite file."""
+
+    def __init__(self, url: str):
+        self.engine = create_engine(url, connect_args={"timeout": 60})
+        self._id_lock = threading.Lock()
+        self._next_ids: Dict[str, int] = {}
+        self._columns: Dict[str, Optional[Set[str]]] = {}
+
+    def columns(self, table: str) -> Optional[Set[str]]:
+        """Column names of a table, or None if the table does not exist."""
+        if table not in self._columns:
+            with self.engine.connect() as conn:
+                exists = conn.execute(text("select 1 from sqlite_master where type = 'table' and name = :t"),
+                                      {"t": table}).first()
+                names = {r[1] for r in conn.execute(text(f"pragma table_xinfo({table})"))} if exists else None
+            self._columns[table] = names
+        return self._columns[table]
+
+    def upgrade_schema(self) -> None:
+        """Create missing tables and add missing columns, so every mapped column can be written."""
+        from . import models  # noqa: F401  registers the tables on Base.metadata
+        from .database import Base, upgrade_sqlite_schema
+
+        Base.metadata.create_all(bind=self.engine)
+        upgrade_sqlite_schema(self.engine)
+        self._columns.clear()
+
+    def users(self) -> Dict[str, Any]:
+        with self.engine.connect() as conn:
+            return {email.lower(): uid for uid, email in conn.execute(text("select id, email from users"))}
+
+    def create_users(self, emails: Iterable[str]) -> None:
+        emails = list(emails)
+        if not emails:
+            return
+        from .auth import hash_password
+        # One random hash shared by every created user: nobody knows the password
+        unusable = hash_password(uuid.uuid4().hex)
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                "insert into users (email, password, role, is_active, is_verified) "
+                "values (:email, :password, 'user', 1, 0)"
+            ), [{"email": e, "password": unusable} for e in emails])
+
+    def ensure_id_map(self) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                "create table if not exists migration_id_map ("
+                "table_name text, source_id text, target_id integer, primary key (table_name, source_id))"
+            ))
+
+    def id_map(self, table: str) -> Dict[str, int]:
+        with self.engine.connect() as conn:
+            rows = conn.execute(text("select source_id, target_id from migration_id_map where table_name = :t"),
+                                {"t": table})
+            return dict(rows.all())
+
+    def read_batch(self, mapping: TableMapping, after: Optional[List[Any]], limit: int,
+                   user_ids: List[Any]) -> List[Dict[str, Any]]:
+        present = self.columns(mapping.sqlite_table) or set()
+        # Columns newer than the file read as NULL; joined columns come from tables every version has
+        select = ", ".join(
+            f"{expr if col in mapping.sqlite_readonly or mapping.sqlite_column(col) in present else 'null'} as {col}"
+            for col, expr in mapping.columns.items() if expr is not None
+        )
+        key = ", ".join(mapping.columns[k] for k in mapping.key)
+        where = [f"{mapping.columns['user_id']} in ({', '.join(str(int(u)) for u in user_ids)})"]
+        params = {}
+        if after is not None:
+            where.append(f"({key}) > ({', '.join(f':k{i}' for i in range(len(after)))})")
+            params = {f"k{i}": v for i, v in enumerate(after)}
+        sql = f"select {select} from {mapping.sqlite_from} where {' and '.join(where)} order by {key} limit {int(limit)}"
+        with self.engine.connect() as conn:
+            return [dict(r) for r in conn.execute(text(sql), params).mappings()]
+
+    def _allocate(self, conn, table: str, count: int) -> int:
+        with self._id_lock:
+            if table not in self._next_ids:
+                current = conn.execute(text(f"select coalesce(max(id), 0) from {table}")).scalar()
+                mapped = conn.execute(text(
+                    "select coalesce(max(target_id), 0) from migration_id_map where table_name = :t"
+                ), {"t": table}).scalar()
+                self._next_ids[table] = max(current, mapped) + 1
+            first = self._next_ids[table]
+            self._next_ids[table] += count
+            return first
+
+    def write_batch(self, mapping: TableMapping, rows: List[Dict[str, Any]]) -> None:
+        """Insert rows already translated to SQLite ids, recording new ids in migration_id_map."""
+        columns = [c for c in mapping.shared_columns() if c not in mapping.sqlite_readonly]
+        names = [mapping.sqlite_column(c) for c in columns]
+        sql = (f"insert or ignore into {mapping.sqlite_table} ({', '.join(names)}) "
+               f"values ({', '.join(':' + c for c in columns)})")
+        with self.engine.begin() as conn:
+            if mapping.has_id:
+                known = self.id_map_for(conn, mapping.sqlite_table, [r["_source_id"] for r in rows])
+                fresh = [r for r in rows if r["_source_id"] not in known]
+                first = self._allocate(conn, mapping.sqlite_table, len(fresh))
+                for offset, r in enumerate(fresh):
+                    known[r["_source_id"]] = first + offset
+                if fresh:
+                    conn.execute(text(
+                        "insert or ignore into migration_id_map (table_name, source_id, target_id) values (:t, :s, :i)"
+                    ), [{"t": mapping.sqlite_table, "s": r["_source_id"], "i": known[r["_source_id"]]} for r in fresh])
+                for r in rows:
+                    r["id"] = known[r["_source_id"]]
+            conn.execute(text(sql), [{c: _sqlite_value(r.get(c)) for c in columns} for r in rows])
+
+    @staticmethod
+    def id_map_for(conn, table: str, source_ids: List[str]) -> Dict[str, int]:
+        # json_each keeps this one bound parameter however large the batch is
+        rows = conn.execute(text(
+            "select source_id, target_id from migration_id_map "
+            "where table_name = :t and source_id in (select value from json_each(:ids))"
+        ), {"t": table, "ids": json.dumps(source_ids)})
+        return dict(rows.all())
+
+
+class PostgresSide:
+    """Reads and writes the Supabase schema over a direct Postgres connection."""
+
+    def __init__(self, dsn: str):
+        try:
+            import psycopg2
+        except ImportError as e:
+            raise SystemExit("The Postgres side of the migration needs psycopg2 (pip install psycopg2-binary)") from e
+        self._psycopg2 = psycopg2
+        self.dsn = dsn
+        self._local = threading.local()
+
+    def _conn(self):
+        # psycopg2 connections are thread-safe but serialize their queries; keep one per worker thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None or conn.closed:
+            conn = self._psycopg2.connect(self.dsn)
+            self._local.conn = conn
+        return conn
+
+    def users(self) -> Dict[str, Any]:
+        with self._conn() as conn, conn.cursor() as cur:
+            cur.execute("select id, email from users where email is not null")
+            return {email.lower(): str(uid) for uid, email in cur.fetchall()}
+
+    def read_batch(self, mapping: TableMapping, after: Optional[List[Any]], limit: int,
+                   user_ids: List[Any]) -> List[Dict[str, Any]]:
+        columns = mapping.shared_columns()
+        key = ", ".join(mapping.key)
+        where = "user_id = any(%s::uuid[])"
+        params: List[Any] = [list(user_ids)]
+        if after is not None:
+            where += f" and ({key}) > ({', '.join(['%s'] * len(after))})"
+            params += after
+        sql = f"select {', '.join(columns)} from {mapping.name} where {where} order by {key} limit %s"
+        with self._conn() as conn, conn.cursor() as cur:
+            cur.execute(sql, params + [limit])
+            return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+    def write_batch(self, mapping: TableMapping, rows: List[Dict[str, Any]]) -> None:
+        """COPY rows into a temp table, then insert them, skipping rows that already exist."""
+        columns = [c for c in mapping.shared_columns() if c in rows[0]]
+        buffer = io.StringIO("".join(",".join(_csv_field(r.get(c)) for c in columns) + "\n" for r in rows))
+        column_list = ", ".join(columns)
+        with self._conn() as conn, conn.cursor() as cur:
+            cur.execute(f"create temp table if not exists _migrate_{mapping.name} "
+                        f"as select {column_list} from {mapping.name} with no data")
+            cur.execute(f"truncate _migrate_{mapping.name}")
+            cur.copy_expert(f"copy _migrate_{mapping.name} ({column_list}) from stdin with (format csv)", buffer)
+            cur.execute(f"insert into {mapping.name} ({column_list}) "
+                        f"select {column_list} from _migrate_{mapping.name} on conflict do nothing")
+
+
+class Checkpoint:
+    """Per-table progress, saved atomically to a JSON file after every batch."""
+
+    def __init__(self, path: str, direction: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.state = {"direction": direction, "tables": {}}
+        if os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            if saved.get("direction") != direction:
+                raise SystemExit(f"{path} belongs to a {saved.get('direction')} migration; "
+                                 f"remove it or pass a different --checkpoint")
+            self.state = saved
+
+    def table(self, name: str) -> Dict[str, Any]:
+        with self._lock:
+            progress = dict(self.state["tables"].get(name, {"after": None, "copied": 0, "done": False}))
+            progress.setdefault("skipped", 0)
+            return progress
+
+    def save(self, name: str, progress: Dict[str, Any]) -> None:
+        with self._lock:
+            self.state["tables"][name] = progress
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.state, f, indent=2, default=str)
+            os.replace(tmp, self.path)
+
+
+class Migration:
+    """Copies every mapped table from one side to the other."""
+
+    def __init__(self, direction: str, sqlite: SQLiteSide, postgres: PostgresSide, checkpoint: Checkpoint,
+                 batch_size: int = DEFAULT_BATCH_SIZE, workers: int = 4, emails: Optional[List[str]] = None):
+        self.direction = direction
+        self.sqlite = sqlite
+        self.postgres = postgres
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.workers = workers
+        self.emails = [e.lower() for e in emails] if emails else None
+        self.source, self.target = (sqlite, postgres) if direction == "to-supabase" else (postgres, sqlite)
+        self.user_map: Dict[Any, Any] = {}
+        self._id_maps: Dict[str, Dict[str, int]] = {}
+        self._id_maps_lock = threading.Lock()
+
+    def map_users(self) -> List[str]:
+        """Match users by email; returns the emails that could not be migrated."""
+        local, remote = self.sqlite.users(), self.postgres.users()
+        emails = self.emails or list(local if self.direction == "to-supabase" else remote)
+        if self.direction == "to-sqlite":
+            self.sqlite.create_users(e for e in emails if e in remote and e not in local)
+            local = self.sqlite.users()
+            self.user_map = {remote[e]: local[e] for e in emails if e in remote}
+            return [e for e in emails if e not in remote]
+        self.user_map = {local[e]: remote[e] for e in emails if e in local and e in remote}
+        return [e for e in emails if e not in local or e not in remote]
+
+    def _parent_ids(self, table: str) -> Dict[str, int]:
+        """Supabase UUID -> SQLite id for an already copied table (to-sqlite only)."""
+        with self._id_maps_lock:
+            if table not in self._id_maps:
+                self._id_maps[table] = self.sqlite.id_map(table)
+            return self._id_maps[table]
+
+    def translate(self, mapping: TableMapping, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Rewrite ids and foreign keys for the target side.
+
+        When copying to SQLite, rows whose parent was not copied are left
+        out, since they would fail a constraint or lose their link; the
+        caller counts them as skipped.
+        """
+        out = []
+        for row in rows:
+            row = dict(row)
+            for column, default in mapping.defaults.items():
+                if row.get(column) is None:
+                    row[column] = default
+            if self.direction == "to-supabase":
+                if mapping.has_id:
+                    row["id"] = supabase_id(mapping.sqlite_table, row["id"])
+                for column, parent in mapping.references.items():
+                    if row.get(column) is None:
+                        continue
+                    if parent == "users":
+                        row[column] = self.user_map[row[column]]
+                    else:
+                        parent_table = next(m.sqlite_table for m in MAPPINGS if m.name == parent)
+                        row[column] = supabase_id(parent_table, row[column])
+            else:
+                if mapping.has_id:
+                    row["_source_id"] = str(row.pop("id"))
+                unmapped = False
+                for column, parent in mapping.references.items():
+                    if row.get(column) is None:
+                        continue
+                    if parent == "users":
+                        row[column] = self.user_map[str(row[column])]
+                    else:
+                        parent_table = next(m.sqlite_table for m in MAPPINGS if m.name == parent)
+                        row[column] = self._parent_ids(parent_table).get(str(row[column]))
+                        unmapped = unmapped or row[column] is None
+                if unmapped:
+                    continue
+            out.append(row)
+        return out
+
+    def copy_table(self, mapping: TableMapping) -> Dict[str, Any]:
+        progress = self.checkpoint.table(mapping.name)
+        if self.direction == "to-supabase" and self.sqlite.columns(mapping.sqlite_table) is None:
+            return {"table": mapping.name, "copied": 0, "skipped": 0, "total": 0, "seconds": 0.0, "missing": True}
+        started = time.perf_counter()
+        copied = skipped = 0
+        user_ids = list(self.user_map)
+        while not progress["done"] and user_ids:
+            rows = self.source.read_batch(mapping, progress["after"], self.batch_size, user_ids)
+            if rows:
+                translated = self.translate(mapping, rows)
+                if translated:
+                    self.target.write_batch(mapping, translated)
+                progress["after"] = [_sqlite_value(rows[-1][k]) for k in mapping.key]
+                progress["copied"] += len(translated)
+                progress["skipped"] += len(rows) - len(translated)
+                copied += len(translated)
+                skipped += len(rows) - len(translated)
+            progress["done"] = len(rows) < self.batch_size
+            self.checkpoint.save(mapping.name, progress)
+        elapsed = time.perf_counter() - started
+        return {"table": mapping.name, "copied": copied, "skipped": skipped, "total": progress["copied"],
+                "seconds": elapsed}
+
+    def run(self) -> List[Dict[str, Any]]:
+        if self.direction == "to-sqlite":
+            self.sqlite.upgrade_schema()
+            self.sqlite.ensure_id_map()
+        missing = self.map_users()
+        for email in missing:
+            print(f"skipping {email}: no matching user on both sides")
+        results = []
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for level in sorted({m.level for m in MAPPINGS}):
+                tables = [m for m in MAPPINGS if m.level == level]
+                for result in pool.map(self.copy_table, tables):
+                    results.append(result)
+                    if result.get("missing"):
+                        print(f"{result['table']:>16}: not in the SQLite database, skipped", flush=True)
+                        continue
+                    rate = result["copied"] / result["seconds"] if result["seconds"] else 0.0
+                    print(f"{result['table']:>16}: {result['copied']:>8} rows in {result['seconds']:6.2f}s "
+                          f"({rate:,.0f} rows/s, {result['total']} total)", flush=True)
+                    if result["skipped"]:
+                        print(f"{'':>16}  skipped {result['skipped']} rows whose parent row was not copied",
+                              flush=True)
+        return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Copy data between the SQLite and Supabase schemas.")
+    parser.add_argument("direction", choices=["to-supabase", "to-sqlite"])
+    parser.add_argument("--sqlite", default="sqlite:///./habit_tracker.db", help="SQLAlchemy URL of the SQLite database")
+    parser.add_argument("--postgres", default=os.getenv("SUPABASE_DB_URL"),
+                        help="Postgres connection string of the Supabase database (default: $SUPABASE_DB_URL)")
+    parser.add_argument("--user", action="append", dest="emails", metavar="EMAIL",
+                        help="only migrate this account (repeatable; default: every matching user)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="rows per batch")
+    parser.add_argument("--workers", type=int, default=4, help="tables copied concurrently")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT,
+                        help="progress file; delete it to start over (default: %(default)s)")
+    args = parser.parse_args(argv)
+    if not args.postgres:
+        parser.error("--postgres or SUPABASE_DB_URL is required")
+
+    checkpoint = Checkpoint(args.checkpoint, args.direction)
+    migration = Migration(args.direction, SQLiteSide(args.sqlite), PostgresSide(args.postgres), checkpoint,
+                          batch_size=args.batch_size, workers=args.workers, emails=args.emails)
+    started = time.perf_counter()
+    results = migration.run()
+    skipped = sum(r["skipped"] for r in results)
+    print(f"copied {sum(r['copied'] for r in results)} rows in {time.perf_counter() - started:.2f}s"
+          + (f", skipped {skipped} rows without a copied parent" if skipped else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Date, Text, Time
+from sqlalchemy import Column, Computed, Integer, SmallInteger, String, ForeignKey, DateTime, Boolean, Date, Text, Time
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -105,6 +105,10 @@ class Task(Base):
     due_date = Column(Date, nullable=True)
     due_time = Column(Time, nullable=True)
     priority = Column(String(20), default="medium")  # high, medium, low
+    # Sortable encoding of priority (0 = high ... 3 = unknown), see app.agenda.PRIORITY_RANKS
+    priority_rank = Column(SmallInteger, Computed(
+        "case priority when 'high' then 0 when 'medium' then 1 when 'low' then 2 else 3 end", persisted=True
+    ), index=True)
     status = Column(String(20), default="pending")  # pending, in_progress, completed
     is_archived = Column(Boolean, default=False)
     reminder_enabled = Column(Boolean, default=False)
@@ -113,7 +117,22 @@ class Task(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     completed_at = Column(DateTime(timezone=True), nullable=True)
+    recurrence_rule = Column(String(255), nullable=True)  # RRULE subset; set on recurring task templates
 
     # Relationships
     owner = relationship("User", back_populates="tasks")
     category = relationship("TaskCategory", back_populates="tasks")
+    occurrences = relationship("TaskOccurrence", back_populates="task", cascade="all, delete-orphan")
+
+
+class TaskOccurrence(Base):
+    """Completed occurrence of a recurring task; pending occurrences are not stored."""
+    __tablename__ = "task_occurrences"
+
+    task_id = Column(Integer, ForeignKey("tasks.id"), primary_key=True)
+    occurrence_date = Column(Date, primary_key=True)
+    status = Column(String(20), default="completed")
+    completed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    task = relationship("Task", back_populates="occurrences")
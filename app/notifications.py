@@ -0,0 +1,178 @@
+import html
+import json
+import os
+import time
+from datetime import date, datetime
+from typing import Any, Dict, Hashable, List, Optional
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+# Minimum seconds between two reminder digests in one session
+REMINDER_MIN_INTERVAL = float(os.getenv("REMINDER_MIN_INTERVAL", "300"))
+# Queue and payload bounds: items beyond these are summarized as "+N more"
+MAX_QUEUED = 50
+MAX_RENDERED = 5
+NOTIFICATION_TIMEOUT_MS = 4000
+# The reminder worker fills the outbox once a minute, so polling more often gains nothing
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "60"))
+
+
+def _state() -> Dict[str, Any]:
+    """Per-session notification state, reset when the day changes."""
+    today = date.today().isoformat()
+    state = st.session_state.get("notifications")
+    if state is None or state["day"] != today:
+        state = {"day": today, "queue": [], "seen": set(), "last_reminder_at": 0.0, "last_outbox_poll": 0.0,
+                 "counter": 0}
+        st.session_state.notifications = state
+    return state
+
+
+def already_notified(dedupe_key: Hashable) -> bool:
+    """Check whether a notification with this key was already queued today."""
+    return dedupe_key in _state()["seen"]
+
+
+def mark_notified(dedupe_key: Hashable) -> None:
+    """Record a key as handled today without queuing anything."""
+    _state()["seen"].add(dedupe_key)
+
+
+def notify(title: str, message: str, kind: str = "info", dedupe_key: Optional[Hashable] = None,
+           subject: Optional[str] = None) -> bool:
+    """
+    Queue a notification for the next render.
+
+    Notifications with a dedupe_key (e.g. ("reminder", habit_id)) are queued
+    at most once per day. Reminders are coalesced into a single digest that
+    lists each reminder's subject. Returns False if the notification was
+    dropped as a duplicate.
+    """
+    state = _state()
+    if dedupe_key is not None:
+        if dedupe_key in state["seen"]:
+            return False
+        state["seen"].add(dedupe_key)
+    state["queue"].append({"title": title, "message": message, "kind": kind, "subject": subject or message})
+    del state["queue"][:-MAX_QUEUED]
+    return True
+
+
+def poll_reminder_outbox(supabase, user_id: str) -> None:
+    """
+    Queue this user's pending reminders from reminder_outbox and mark them delivered.
+
+    Runs at most once per OUTBOX_POLL_INTERVAL per session; the query only
+    touches the user's pending rows (see app/reminder_worker.py).
+    """
+    state = _state()
+    now = time.time()
+    if now - state["last_outbox_poll"] < OUTBOX_POLL_INTERVAL:
+        return
+    state["last_outbox_poll"] = now
+
+    rows = (
+        supabase.table("reminder_outbox")
+        .select("id, habit_id, habit_name")
+        .eq("user_id", user_id)
+        .eq("status", "pending")
+        .execute()
+        .data
+    )
+    if not rows:
+        return
+    for row in rows:
+        notify(
+            "Habit Reminder",
+            f"Don't forget to complete your habit: {row['habit_name']}",
+            kind="reminder", dedupe_key=("reminder", row["habit_id"]), subject=row["habit_name"],
+        )
+    supabase.table("reminder_outbox").update(
+        {"status": "delivered", "delivered_at": datetime.now().astimezone().isoformat()}
+    ).in_("id", [r["id"] for r in rows]).execute()
+
+
+def _coalesce(items: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Merge reminders into one digest entry and cap the number of entries."""
+    reminders = [i for i in items if i["kind"] == "reminder"]
+    others = [i for i in items if i["kind"] != "reminder"]
+
+    entries = []
+    if len(reminders) == 1:
+        entries.append(reminders[0])
+    elif reminders:
+        names = [r["subject"] for r in reminders[:MAX_RENDERED]]
+        extra = len(reminders) - len(names)
+        summary = ", ".join(names) + (f" and {extra} more" if extra else "")
+        entries.append({"title": f"{len(reminders)} Habit Reminders", "message": f"Don't forget: {summary}"})
+
+    entries.extend(others[:MAX_RENDERED])
+    if len(others) > MAX_RENDERED:
+        entries.append({"title": "More updates", "message": f"+{len(others) - MAX_RENDERED} more"})
+    return entries
+
+
+def _run_script(script: str) -> None:
+    """Run a script in a component iframe; scripts inside st.markdown are never executed."""
+    # st.iframe replaces components.html in newer Streamlit releases
+    if hasattr(st, "iframe"):
+        st.iframe(script, height=1)
+    else:
+        components.html(script, height=0)
+
+
+def render_notifications() -> None:
+    """
+    Deliver queued notifications as one HTML/JS block.
+
+    Call once per full run, not from fragments: each call renders its own
+    component iframe. Notifications queued by a fragment action are
+    delivered on the next full run. Reminders are held back until
+    REMINDER_MIN_INTERVAL has passed since the last reminder digest; other
+    notifications are delivered immediately.
+    """
+    state = _state()
+    if not state["queue"]:
+        return
+
+    now = time.time()
+    reminders_due = now - state["last_reminder_at"] >= REMINDER_MIN_INTERVAL
+    deliver, held = [], []
+    for item in state["queue"]:
+        (deliver if item["kind"] != "reminder" or reminders_due else held).append(item)
+    if not deliver:
+        return
+    state["queue"] = held
+    if any(i["kind"] == "reminder" for i in deliver):
+        state["last_reminder_at"] = now
+
+    entries = _coalesce(deliver)
+    state["counter"] += 1
+    element_id = f"notification_{state['counter']}"
+    body = "<br><br>".join(
+        f"<strong>{html.escape(e['title'])}</strong><br>{html.escape(e['message'])}" for e in entries
+    )
+    first = entries[0]
+    browser_title = first["title"] if len(entries) == 1 else f"{len(entries)} notifications"
+
+    # The component runs in an iframe, so the toast is added to the app's own
+    # document, where the .notification styles and the granted permission live
+    _run_script(f"""
+    <script>
+        const doc = window.parent.document;
+        const notif = doc.createElement("div");
+        notif.className = "notification";
+        notif.id = {json.dumps(element_id)};
+        notif.innerHTML = {json.dumps(body)};
+        doc.body.appendChild(notif);
+        // Timed on the parent, as this iframe may be gone by the time it fires
+        window.parent.setTimeout(() => notif.remove(), {NOTIFICATION_TIMEOUT_MS});
+
+        // Also show one browser notification for the whole batch
+        const ParentNotification = window.parent.Notification;
+        if (ParentNotification && ParentNotification.permission === "granted") {{
+            new ParentNotification({json.dumps(browser_title)}, {{body: {json.dumps(first["message"])}}});
+        }}
+    </script>
+    """)
@@ -0,0 +1,81 @@
+from datetime import date, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import text
+
+PERIOD_LABELS = {"daily": "today", "weekly": "this week", "monthly": "this month"}
+
+SQLITE_ENTRIES_QUERY = """
+select e.habit_id, e.date
+from habit_entries e
+join habits h on h.id = e.habit_id
+where h.user_id = :user_id and not h.is_archived and e.completed and e.date between :start and :end
+"""
+
+
+def period_bounds(frequency: Optional[str], day: date) -> Tuple[date, date]:
+    """First and last day of the period containing day: the day itself, its ISO week or its month."""
+    if frequency == "weekly":
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    if frequency == "monthly":
+        start = day.replace(day=1)
+        following = (start + timedelta(days=32)).replace(day=1)
+        return start, following - timedelta(days=1)
+    return day, day
+
+
+def fetch_period_progress(supabase, today: Optional[date] = None) -> Dict[Any, Dict[str, Any]]:
+    """
+    Progress of all the caller's habits in their current periods, keyed by habit id.
+
+    One call to the habit_period_progress RPC, which counts completions for
+    every habit in a single aggregate query. Each value has period_start,
+    period_end, done, target, remaining and progress (0..1).
+    """
+    today = today or date.today()
+    rows = supabase.rpc("habit_period_progress", {"p_today": today.isoformat()}).execute().data
+    return {r["habit_id"]: r for r in rows}
+
+
+def period_progress_frame(habits: pd.DataFrame, entries: pd.DataFrame, today: date) -> pd.DataFrame:
+    """
+    Vectorized progress for many habits at once.
+
+    habits needs id, frequency and target_count columns; entries needs
+    habit_id and date (one row per completion). Returns one row per habit,
+    indexed by id, with the same fields as habit_period_progress().
+    """
+    frame = habits.set_index("id")[["frequency", "target_count"]].copy()
+    # All current periods contain today, so there is one pair of bounds per frequency
+    bounds = {f: period_bounds(f, today) for f in PERIOD_LABELS}
+    frame["period_start"] = frame["frequency"].map(lambda f: bounds.get(f, bounds["daily"])[0])
+    frame["period_end"] = frame["frequency"].map(lambda f: bounds.get(f, bounds["daily"])[1])
+
+    joined = entries[["habit_id", "date"]].merge(frame[["period_start", "period_end"]], left_on="habit_id",
+                                                 right_index=True)
+    in_period = joined[(joined["date"] >= joined["period_start"]) & (joined["date"] <= joined["period_end"])]
+    frame["done"] = in_period.groupby("habit_id").size().reindex(frame.index, fill_value=0)
+
+    frame["target"] = frame["target_count"].fillna(1).clip(lower=1).astype(int)
+    frame["remaining"] = (frame["target"] - frame["done"]).clip(lower=0)
+    frame["progress"] = (frame["done"] / frame["target"]).clip(upper=1.0)
+    return frame.drop(columns=["frequency", "target_count"])
+
+
+def period_progress_sqlite(db, user_id: int, today: Optional[date] = None) -> pd.DataFrame:
+    """period_progress_frame() over the user's unarchived habits in the SQLite models."""
+    today = today or date.today()
+    habits = pd.DataFrame(db.execute(
+        text("select id, frequency, target_count from habits where user_id = :user_id and not is_archived"),
+        {"user_id": user_id},
+    ).mappings().all(), columns=["id", "frequency", "target_count"])
+    # The widest current period bounds the entries worth reading
+    start = min(period_bounds(f, today)[0] for f in PERIOD_LABELS)
+    end = max(period_bounds(f, today)[1] for f in PERIOD_LABELS)
+    entries = pd.DataFrame(db.execute(text(SQLITE_ENTRIES_QUERY), {
+        "user_id": user_id, "start": start, "end": end,
+    }).mappings().all(), columns=["habit_id", "date"])
+    entries["date"] = pd.to_datetime(entries["date"]).dt.date
+    return period_progress_frame(habits, entries, today)
@@ -0,0 +1,212 @@
+import calendar
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+WEEKDAYS = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY")
+
+
+class RecurrenceRule:
+    """
+    Subset of RFC 5545 RRULE used for recurring tasks.
+
+    Supports FREQ=DAILY|WEEKLY|MONTHLY with INTERVAL, BYDAY (weekly),
+    BYMONTHDAY (monthly), UNTIL and COUNT, e.g.
+    "FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH;UNTIL=20261231". Occurrences are
+    computed arithmetically from the task's start date, so expanding a window
+    costs time proportional to the window, not to the task's age.
+    """
+
+    def __init__(self, freq: str, interval: int = 1, by_day: Optional[Iterable[int]] = None,
+                 by_month_day: Optional[int] = None, until: Optional[date] = None, count: Optional[int] = None):
+        if freq not in FREQUENCIES:
+            raise ValueError(f"Unsupported FREQ: {freq}")
+        if interval < 1:
+            raise ValueError("INTERVAL must be at least 1")
+        self.freq = freq
+        self.interval = interval
+        self.by_day = sorted(set(by_day)) if by_day else None
+        self.by_month_day = by_month_day
+        self.until = until
+        self.count = count
+
+    @classmethod
+    def parse(cls, text: str) -> "RecurrenceRule":
+        """Parse an RRULE string (with or without the "RRULE:" prefix)."""
+        if text.upper().startswith("RRULE:"):
+            text = text[6:]
+        parts = dict(p.split("=", 1) for p in text.upper().split(";") if p)
+        try:
+            return cls(
+                freq=parts["FREQ"],
+                interval=int(parts.get("INTERVAL", 1)),
+                by_day=[WEEKDAYS.index(d[-2:]) for d in parts["BYDAY"].split(",")] if "BYDAY" in parts else None,
+                by_month_day=int(parts["BYMONTHDAY"]) if "BYMONTHDAY" in parts else None,
+                until=date(int(parts["UNTIL"][:4]), int(parts["UNTIL"][4:6]), int(parts["UNTIL"][6:8]))
+                if "UNTIL" in parts else None,
+                count=int(parts["COUNT"]) if "COUNT" in parts else None,
+            )
+        except (KeyError, ValueError) as e:
+            raise ValueError(f"Invalid recurrence rule {text!r}: {e}") from e
+
+    def to_string(self) -> str:
+        parts = [f"FREQ={self.freq}"]
+        if self.interval != 1:
+            parts.append(f"INTERVAL={self.interval}")
+        if self.by_day:
+            parts.append("BYDAY=" + ",".join(WEEKDAYS[d] for d in self.by_day))
+        if self.by_month_day:
+            parts.append(f"BYMONTHDAY={self.by_month_day}")
+        if self.until:
+            parts.append(f"UNTIL={self.until.strftime('%Y%m%d')}")
+        if self.count:
+            parts.append(f"COUNT={self.count}")
+        return ";".join(parts)
+
+    def describe(self) -> str:
+        """Short human readable summary, e.g. "Every 2 weeks on Mon, Thu"."""
+        unit = {"DAILY": "day", "WEEKLY": "week", "MONTHLY": "month"}[self.freq]
+        text = f"Every {unit}" if self.interval == 1 else f"Every {self.interval} {unit}s"
+        if self.by_day:
+            text += " on " + ", ".join(calendar.day_abbr[d] for d in self.by_day)
+        if self.by_month_day:
+            text += f" on day {self.by_month_day}"
+        return text
+
+    def occurrences(self, dtstart: date, start: date, end: date) -> Iterator[date]:
+        """Lazily yield occurrence dates within [start, end] (inclusive)."""
+        if self.until and self.until < end:
+            end = self.until
+        if end < dtstart or end < start:
+            return
+        start = max(start, dtstart)
+        if self.freq == "DAILY":
+            yield from self._daily(dtstart, start, end)
+        elif self.freq == "WEEKLY":
+            yield from self._weekly(dtstart, start, end)
+        else:
+            yield from self._monthly(dtstart, start, end)
+
+    def _daily(self, dtstart: date, start: date, end: date) -> Iterator[date]:
+        # First index n with dtstart + n * interval >= start
+        n = -(-(start - dtstart).days // self.interval)
+        while True:
+            if self.count is not None and n >= self.count:
+                return
+            day = dtstart + timedelta(days=n * self.interval)
+            if day > end:
+                return
+            yield day
+            n += 1
+
+    def _weekly(self, dtstart: date, start: date, end: date) -> Iterator[date]:
+        days = self.by_day or [dtstart.weekday()]
+        anchor = dtstart - timedelta(days=dtstart.weekday())
+        # Occurrences in dtstart's own week that fall before dtstart don't count
+        skipped = sum(1 for d in days if d < dtstart.weekday())
+        week = (start - anchor).days // 7
+        week += -week % self.interval
+        while True:
+            monday = anchor + timedelta(weeks=week)
+            if monday > end:
+                return
+            for position, weekday in enumerate(days):
+                day = monday + timedelta(days=weekday)
+                if day < start:
+                    continue
+                if day > end:
+                    return
+                index = (week // self.interval) * len(days) + position - skipped
+                if self.count is not None and index >= self.count:
+                    return
+                yield day
+            week += self.interval
+
+    def _monthly(self, dtstart: date, start: date, end: date) -> Iterator[date]:
+        month_day = self.by_month_day or dtstart.day
+        first = dtstart.year * 12 + dtstart.month - 1
+
+        def occurrence(step: int) -> Optional[date]:
+            year, month0 = divmod(first + step * self.interval, 12)
+            # Months without that day (e.g. the 31st) are skipped, as in RFC 5545
+            if month_day > calendar.monthrange(year, month0 + 1)[1]:
+                return None
+            day = date(year, month0 + 1, month_day)
+            return day if day >= dtstart else None
+
+        # First step whose month is not before start's month
+        step = -(-(start.year * 12 + start.month - 1 - first) // self.interval)
+        index = 0
+        if self.count is not None:
+            # COUNT numbers occurrences from dtstart, so count the ones before the window
+            if month_day <= 28:
+                index = step - (1 if step and month_day < dtstart.day else 0)
+            else:
+                index = sum(1 for s in range(step) if occurrence(s))
+        while True:
+            year, month0 = divmod(first + step * self.interval, 12)
+            if date(year, month0 + 1, 1) > end:
+                return
+            day = occurrence(step)
+            if day:
+                if self.count is not None and index >= self.count:
+                    return
+                index += 1
+                if start <= day <= end:
+                    yield day
+            step += 1
+
+
+def expand_tasks(templates: List[Dict[str, Any]], start: date, end: date,
+                 completed: Set[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """
+    Expand recurring task templates into occurrence rows for a date window.
+
+    Each occurrence is a copy of its template with due_date set to the
+    occurrence date, template_id pointing at the template, and status taken
+    from the persisted completions ((task_id, iso date) pairs).
+    """
+    occurrences = []
+    for template in templates:
+        rule = RecurrenceRule.parse(template["recurrence_rule"])
+        # Without a due date the series starts on the day the task was created, not with the window
+        anchor = template.get("due_date") or template.get("created_at")
+        dtstart = date.fromisoformat(anchor[:10]) if anchor else start
+        for day in rule.occurrences(dtstart, start, end):
+            day_str = day.isoformat()
+            occurrences.append({
+                **template,
+                "template_id": template["id"],
+                "due_date": day_str,
+                "status": "completed" if (template["id"], day_str) in completed else "pending",
+            })
+    occurrences.sort(key=lambda o: o["due_date"])
+    return occurrences
+
+
+def fetch_completed_occurrences(supabase, user_id: str, start: date, end: date) -> Set[Tuple[str, str]]:
+    """Return (task_id, iso date) pairs of occurrences completed within the window."""
+    rows = (
+        supabase.table("task_occurrences")
+        .select("task_id, occurrence_date")
+        .eq("user_id", user_id)
+        .gte("occurrence_date", start.isoformat())
+        .lte("occurrence_date", end.isoformat())
+        .execute()
+        .data
+    )
+    return {(r["task_id"], r["occurrence_date"]) for r in rows}
+
+
+def complete_occurrence(supabase, occurrence: Dict[str, Any], user_id: str) -> None:
+    """
+    Persist one completed occurrence; pending occurrences are never stored.
+
+    Completing an occurrence that is already stored (e.g. from a second tab)
+    keeps the first completion instead of failing on the primary key.
+    """
+    supabase.table("task_occurrences").upsert({
+        "task_id": occurrence["template_id"],
+        "occurrence_date": occurrence["due_date"],
+        "user_id": user_id,
+    }, on_conflict="task_id,occurrence_date", ignore_duplicates=True).execute()
@@ -0,0 +1,88 @@
+"""
+Reminder fan-out worker.
+
+Once a minute, calls the enqueue_due_reminders() function from
+supabase_setup.sql. That function queues a row in reminder_outbox for every
+habit whose reminder is due within the next hour and that hasn't been logged
+today, across all users in one query. Sessions pick up their own rows (see
+app.notifications.poll_reminder_outbox).
+
+Once an hour it also calls purge_tombstones(), which deletes delta sync
+tombstones (deleted_rows) older than TOMBSTONE_RETENTION. The retention must
+exceed FULL_SYNC_INTERVAL (see app.sync), the longest a client goes without
+a full resync.
+
+Needs the service role key, because the function reads every user's habits:
+
+    SUPABASE_URL=... SUPABASE_SERVICE_KEY=... python -m app.reminder_worker
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+REMINDER_WORKER_INTERVAL = float(os.getenv("REMINDER_WORKER_INTERVAL", "60"))  # seconds
+TOMBSTONE_RETENTION = float(os.getenv("TOMBSTONE_RETENTION", str(24 * 3600)))  # seconds
+TOMBSTONE_PURGE_INTERVAL = 3600  # seconds
+
+
+def create_service_client():
+    """Supabase client authenticated with the service role key."""
+    from supabase import create_client
+
+    load_dotenv()
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_KEY")
+    if not url or not key:
+        raise SystemExit("SUPABASE_URL and SUPABASE_SERVICE_KEY must be set")
+    return create_client(url, key)
+
+
+def run_once(supabase, now: Optional[datetime] = None) -> int:
+    """Queue every reminder due within the next hour; returns the number of new outbox rows."""
+    now = now or datetime.now()
+    return supabase.rpc("enqueue_due_reminders", {"p_now": now.isoformat(timespec="seconds")}).execute().data or 0
+
+
+def purge_tombstones(supabase, retention: float = TOMBSTONE_RETENTION) -> int:
+    """Delete tombstones older than retention seconds; returns the number deleted."""
+    return supabase.rpc("purge_tombstones", {"p_retention": f"{int(retention)} seconds"}).execute().data or 0
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from .sync import FULL_SYNC_INTERVAL
+
+    parser = argparse.ArgumentParser(description="Queue due habit reminders for all users every minute.")
+    parser.add_argument("--interval", type=float, default=REMINDER_WORKER_INTERVAL,
+                        help="seconds between runs (default: %(default)s)")
+    parser.add_argument("--once", action="store_true", help="run a single pass and exit")
+    args = parser.parse_args(argv)
+    if TOMBSTONE_RETENTION <= FULL_SYNC_INTERVAL:
+        raise SystemExit("TOMBSTONE_RETENTION must be longer than FULL_SYNC_INTERVAL")
+
+    supabase = create_service_client()
+    last_purge = None
+    while True:
+        started = time.monotonic()
+        try:
+            queued = run_once(supabase)
+            print(f"{datetime.now():%Y-%m-%d %H:%M:%S} queued {queued} reminders", flush=True)
+            if last_purge is None or started - last_purge >= TOMBSTONE_PURGE_INTERVAL:
+                last_purge = started
+                purged = purge_tombstones(supabase)
+                print(f"{datetime.now():%Y-%m-%d %H:%M:%S} purged {purged} tombstones", flush=True)
+        except Exception as e:
+            # A failed pass is retried on the next tick; reminders are idempotent per habit and day
+            print(f"{datetime.now():%Y-%m-%d %H:%M:%S} reminder pass failed: {e}", flush=True)
+            if args.once:
+                raise
+        if args.once:
+            return
+        time.sleep(max(0.0, args.interval - (time.monotonic() - started)))
+
+
+if __name__ == "__main__":
+    main()
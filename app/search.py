@@ -0,0 +1,176 @@
+import html
+import re
+from typing import Any, Dict, List, Set, Tuple
+
+from sqlalchemy import text
+
+# Markers placed around matches by ts_headline / FTS5 highlight(); turned into <mark> by highlight_html()
+MATCH_START = "«"
+MATCH_STOP = "»"
+# pg_trgm's default similarity threshold, i.e. what the % operator in search_items() uses
+TRIGRAM_THRESHOLD = 0.3
+
+# SQLite FTS5 index over tasks and habits. rowid encodes the source row:
+# tasks.id * 2 for tasks, habits.id * 2 + 1 for habits, so triggers can
+# update or delete an entry by rowid without scanning the index.
+SQLITE_SEARCH_DDL = [
+    """
+    create virtual table if not exists search_index using fts5(
+        title, body, user_id unindexed,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    """
+    create trigger if not exists tasks_search_insert after insert on tasks begin
+        insert into search_index (rowid, title, body, user_id)
+        values (new.id * 2, new.title, coalesce(new.description, ''), new.user_id);
+    end
+    """,
+    """
+    create trigger if not exists tasks_search_update after update of title, description on tasks begin
+        delete from search_index where rowid = old.id * 2;
+        insert into search_index (rowid, title, body, user_id)
+        values (new.id * 2, new.title, coalesce(new.description, ''), new.user_id);
+    end
+    """,
+    """
+    create trigger if not exists tasks_search_delete after delete on tasks begin
+        delete from search_index where rowid = old.id * 2;
+    end
+    """,
+    """
+    create trigger if not exists habits_search_insert after insert on habits begin
+        insert into search_index (rowid, title, body, user_id)
+        values (new.id * 2 + 1, new.title, coalesce(new.description, ''), new.user_id);
+    end
+    """,
+    """
+    create trigger if not exists habits_search_update after update of title, description on habits begin
+        delete from search_index where rowid = old.id * 2 + 1;
+        insert into search_index (rowid, title, body, user_id)
+        values (new.id * 2 + 1, new.title, coalesce(new.description, ''), new.user_id);
+    end
+    """,
+    """
+    create trigger if not exists habits_search_delete after delete on habits begin
+        delete from search_index where rowid = old.id * 2 + 1;
+    end
+    """,
+]
+
+SQLITE_SEARCH_BACKFILL = """
+    insert into search_index (rowid, title, body, user_id)
+    select id * 2, title, coalesce(description, ''), user_id from tasks
+    union all
+    select id * 2 + 1, title, coalesce(description, ''), user_id from habits
+"""
+
+# Title matches weigh 10x body matches; bm25() is lower-is-better
+SQLITE_SEARCH_QUERY = """
+    select rowid,
+           highlight(search_index, 0, :start, :stop) as title,
+           snippet(search_index, 1, :start, :stop, '...', 12) as snippet,
+           bm25(search_index, 10.0, 1.0) as score
+    from search_index
+    where search_index match :query and user_id = :user_id
+    order by score
+    limit :limit offset :offset
+"""
+
+SQLITE_SEARCH_COUNT = """
+    select count(*) from search_index where search_index match :query and user_id = :user_id
+"""
+
+SQLITE_SEARCH_TITLES = """
+    select rowid, title from search_index where user_id = :user_id
+"""
+
+
+def init_sqlite_search(engine) -> None:
+    """Create the FTS5 index and its sync triggers, populating it on first use."""
+    with engine.begin() as conn:
+        for ddl in SQLITE_SEARCH_DDL:
+            conn.execute(text(ddl))
+        if conn.execute(text("select count(*) from search_index")).scalar() == 0:
+            conn.execute(text(SQLITE_SEARCH_BACKFILL))
+
+
+def fts_query(query: str) -> str:
+    """Turn free text into an FTS5 query: every word must match, as a prefix."""
+    words = re.findall(r"\w+", query)
+    return " ".join('"' + w.replace('"', '""') + '"*' for w in words)
+
+
+def trigrams(value: str) -> Set[str]:
+    """Trigrams of a string as pg_trgm extracts them: per lowercased word, padded with two spaces before and one after."""
+    return {f"  {w} "[i:i + 3] for w in re.findall(r"[^\W_]+", value.lower()) for i in range(len(w) + 1)}
+
+
+def similarity(a: str, b: str) -> float:
+    """pg_trgm's similarity(): shared trigrams over all distinct trigrams of both strings."""
+    left, right = trigrams(a), trigrams(b)
+    return len(left & right) / len(left | right) if left and right else 0.0
+
+
+def fuzzy_search_sqlite(db, user_id: int, query: str, limit: int = 20,
+                        offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Titles similar to the query, for typos such as "grocries".
+
+    FTS5 only matches whole tokens and prefixes, so this mirrors the trigram
+    half of search_items(): every title of the user scoring at least
+    TRIGRAM_THRESHOLD, best first. It scans the user's titles, so
+    search_sqlite() only falls back to it when the index finds nothing.
+    """
+    rows = db.execute(text(SQLITE_SEARCH_TITLES), {"user_id": user_id}).mappings().all()
+    scored = [(similarity(r["title"], query), r) for r in rows]
+    hits = sorted(((score, r) for score, r in scored if score >= TRIGRAM_THRESHOLD),
+                  key=lambda hit: (-hit[0], hit[1]["title"]))
+    results = [{
+        "kind": "task" if r["rowid"] % 2 == 0 else "habit",
+        "id": r["rowid"] // 2,
+        "title": r["title"],
+        "snippet": "",
+        "rank": score,
+    } for score, r in hits[offset:offset + limit]]
+    return results, len(hits)
+
+
+def search_sqlite(db, user_id: int, query: str, limit: int = 20, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Ranked, paginated search over the user's tasks and habits in SQLite.
+
+    Falls back to fuzzy_search_sqlite() when the full-text index has no match.
+    """
+    match = fts_query(query)
+    if not match:
+        return [], 0
+    rows = db.execute(text(SQLITE_SEARCH_QUERY), {
+        "start": MATCH_START, "stop": MATCH_STOP, "query": match,
+        "user_id": user_id, "limit": limit, "offset": offset,
+    }).mappings().all()
+    total = db.execute(text(SQLITE_SEARCH_COUNT), {"query": match, "user_id": user_id}).scalar()
+    if not total:
+        return fuzzy_search_sqlite(db, user_id, query, limit, offset)
+    results = [{
+        "kind": "task" if r["rowid"] % 2 == 0 else "habit",
+        "id": r["rowid"] // 2,
+        "title": r["title"],
+        "snippet": r["snippet"],
+        "rank": -r["score"],
+    } for r in rows]
+    return results, total
+
+
+def search_supabase(supabase, query: str, limit: int = 20, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+    """Ranked, paginated search through the search_items RPC (RLS limits it to the caller's rows)."""
+    if not query.strip():
+        return [], 0
+    rows = supabase.rpc("search_items", {"p_query": query, "p_limit": limit, "p_offset": offset}).execute().data
+    return rows, rows[0]["total"] if rows else 0
+
+
+def highlight_html(value: str) -> str:
+    """Escape a title/snippet and turn the match markers into <mark> tags."""
+    escaped = html.escape(value or "")
+    return escaped.replace(MATCH_START, "<mark>").replace(MATCH_STOP, "</mark>")
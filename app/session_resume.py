@@ -0,0 +1,146 @@
+"""
+Silent session resume across reloads and new tabs.
+
+After a sign-in the browser keeps a resume token in a cookie: a JWT signed
+with REFRESH_SECRET_KEY (see app.auth) that identifies the user and carries
+the Supabase refresh token, encrypted with a key derived from the same
+secret. A new session validates the token locally with
+verify_token(..., "refresh"), exchanges the Supabase refresh token for a
+fresh session (no password check) and reloads the profile from the users
+table, so role and name changes apply on the next resume.
+
+Resuming rotates the cookie, but never extends it: the absolute expiry
+("aexp") is fixed at sign-in, REFRESH_TOKEN_EXPIRE_DAYS later, and carried
+into every rotated token. After that the user has to sign in again.
+
+The cookie is written from the page, so it cannot be HttpOnly; it is
+Secure and SameSite=Strict. Set REFRESH_SECRET_KEY so that tokens outlive a
+restart and are accepted by every worker.
+"""
+import base64
+import hashlib
+import json
+import os
+import time
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+import streamlit as st
+import streamlit.components.v1 as components
+from cryptography.fernet import Fernet, InvalidToken
+
+from .auth import REFRESH_SECRET_KEY, REFRESH_TOKEN_EXPIRE_DAYS, create_refresh_token, decode_token, verify_token
+
+RESUME_COOKIE = os.getenv("RESUME_COOKIE", "zenith_resume")
+RESUME_COOKIE_MAX_AGE = REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600
+
+# The JWT is only signed, so the Supabase refresh token inside it is encrypted
+_fernet = Fernet(base64.urlsafe_b64encode(hashlib.sha256(b"resume:" + REFRESH_SECRET_KEY.encode()).digest()))
+
+
+def create_resume_token(user: Dict[str, Any], refresh_token: str, expires_at: Optional[int] = None) -> str:
+    """
+    Resume token for a signed-in user and their current Supabase refresh token.
+
+    expires_at is the absolute expiry (epoch seconds) of the sign-in; a new
+    sign-in gets RESUME_COOKIE_MAX_AGE from now, rotations pass the original.
+    """
+    expires_at = expires_at or int(time.time()) + RESUME_COOKIE_MAX_AGE
+    return create_refresh_token({
+        "sub": user["email"], "uid": user["id"], "aexp": expires_at,
+        "srt": _fernet.encrypt(refresh_token.encode()).decode(),
+    }, expires_delta=timedelta(seconds=max(expires_at - int(time.time()), 0)))
+
+
+def read_resume_token(token: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Claims of a valid resume token, with srt decrypted, or None if it is
+    missing, forged, expired or of another type.
+    """
+    if not token or verify_token(token, "refresh") is None:
+        return None
+    claims = decode_token(token, is_refresh=True)
+    if claims is None or claims.get("aexp", 0) <= time.time():
+        return None
+    try:
+        claims["srt"] = _fernet.decrypt(claims["srt"].encode()).decode()
+    except (InvalidToken, KeyError, AttributeError):
+        return None
+    return claims
+
+
+def remember_session(user: Dict[str, Any], refresh_token: str, expires_at: Optional[int] = None) -> None:
+    """Schedule the resume cookie to be (re)written on this session's next render."""
+    expires_at = expires_at or int(time.time()) + RESUME_COOKIE_MAX_AGE
+    token = create_resume_token(user, refresh_token, expires_at)
+    st.session_state.resume_cookie = (token, max(expires_at - int(time.time()), 0))
+
+
+def forget_session() -> None:
+    """Schedule the resume cookie to be cleared on this session's next render."""
+    st.session_state.resume_cookie = ("", 0)
+
+
+def write_resume_cookie() -> None:
+    """
+    Write a pending cookie change, if any.
+
+    Called once per rerun rather than where the change is made, because
+    those places call st.rerun() right after, which would discard the
+    component before its script runs.
+    """
+    pending = st.session_state.pop("resume_cookie", None)
+    if pending is None:
+        return
+    value, max_age = pending
+    cookie = f"{RESUME_COOKIE}={value}; Max-Age={max_age}; Path=/; Secure; SameSite=Strict"
+    script = f"<script>window.parent.document.cookie = {json.dumps(cookie)};</script>"
+    # st.iframe replaces components.html in newer Streamlit releases
+    if hasattr(st, "iframe"):
+        st.iframe(script, height=1)
+    else:
+        components.html(script, height=0)
+
+
+def resume_session(supabase) -> Optional[Dict[str, Any]]:
+    """
+    Sign this session in from the browser's resume cookie.
+
+    Tried once per session: the cookies Streamlit exposes are those sent when
+    the session connected, so after a sign-out they would still hold the old
+    token. Returns the user dict for st.session_state.user, built from the
+    refreshed Supabase user and their current profile, or None.
+    """
+    if st.session_state.get("resume_checked"):
+        return None
+    st.session_state.resume_checked = True
+
+    claims = read_resume_token(st.context.cookies.get(RESUME_COOKIE))
+    if claims is None:
+        return None
+    try:
+        res = supabase.auth.refresh_session(claims["srt"])
+    except Exception as e:
+        # Revoked, expired or already rotated: fall back to the login form
+        print(f"Session resume failed: {e}")
+        forget_session()
+        return None
+    if not res.session:
+        forget_session()
+        return None
+
+    auth_user = res.user
+    # Read the profile now rather than trusting the cookie, so a changed role applies
+    rows = supabase.table("users").select("full_name, role").eq("id", auth_user.id).execute().data
+    profile = rows[0] if rows else {}
+    user = {
+        "id": auth_user.id,
+        "email": auth_user.email,
+        "name": ((auth_user.user_metadata or {}).get("full_name") or profile.get("full_name")
+                 or auth_user.email.split("@")[0]),
+        "role": profile.get("role") or "user",
+    }
+    st.session_state.session_token = res.session.access_token
+    # Supabase rotates refresh tokens, so the cookie must carry the new one, but not a later expiry
+    remember_session(user, res.session.refresh_token, expires_at=claims["aexp"])
+    return user
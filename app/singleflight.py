@@ -0,0 +1,73 @@
+import copy
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls into one.
+
+    do(key, fn) runs fn() unless a call with the same key is already in
+    flight, in which case it waits for that call and returns its result (or
+    raises its exception). Keys must identify both the query and the
+    principal it runs as, so one user never receives another user's rows.
+    Coalescing is per process; sharing results across processes is the job
+    of app.cache.
+
+    Waiters get a deep copy of the result, because pages mutate fetched rows
+    in place.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        result = None
+        try:
+            result = fn()
+            return result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            # No new waiters can join now. Give existing ones a private
+            # snapshot, since the leader's caller may mutate the result.
+            if call.waiters and call.error is None:
+                call.result = copy.deepcopy(result)
+            call.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,31 @@
+from datetime import date, timedelta
+from typing import Any, Dict, List
+
+STAT_COLUMNS = ("habits_done", "tasks_completed", "tasks_created")
+
+
+def get_daily_stats(supabase, user_id: str, start: date, end: date) -> List[Dict[str, Any]]:
+    """
+    Read the daily_user_stats rollup for a date range (inclusive).
+
+    Returns one row per day in order, with zero counts for days that have no
+    rollup row yet, so charts can plot the result directly.
+    """
+    rows = (
+        supabase.table("daily_user_stats")
+        .select("day, " + ", ".join(STAT_COLUMNS))
+        .eq("user_id", user_id)
+        .gte("day", start.isoformat())
+        .lte("day", end.isoformat())
+        .order("day")
+        .execute()
+        .data
+    )
+    by_day = {r["day"]: r for r in rows}
+
+    stats = []
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        row = by_day.get(day.isoformat(), {})
+        stats.append({"day": day, **{col: row.get(col, 0) for col in STAT_COLUMNS}})
+    return stats
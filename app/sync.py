@@ -0,0 +1,96 @@
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import streamlit as st
+
+from .memory import memory_accountant
+from .singleflight import single_flight
+
+# Seconds between full resyncs. Bounds how long a missed change can go
+# unnoticed and how long tombstones must be kept (see supabase_setup.sql).
+FULL_SYNC_INTERVAL = float(os.getenv("FULL_SYNC_INTERVAL", "1800"))
+
+
+class TableSync:
+    """
+    In-session copy of one table kept current with delta fetches.
+
+    The first sync fetches every visible row. Later syncs fetch only rows
+    whose revision is above the highest one seen, plus tombstones from
+    deleted_rows, and merge them into the copy; when nothing changed both
+    queries return no rows. Revisions come from one global sequence, so a
+    write committed out of sequence order can be missed until the next full
+    resync (FULL_SYNC_INTERVAL); writes from a single user are effectively
+    serialized, which makes this rare.
+
+    With a principal (the user id the queries run as), identical fetches
+    from several tabs of the same user are coalesced into one request.
+    """
+
+    def __init__(self, table: str, columns: str = "*", full_sync_interval: float = FULL_SYNC_INTERVAL,
+                 principal: Optional[str] = None):
+        self.table = table
+        self.columns = columns
+        self.principal = principal
+        self.full_sync_interval = full_sync_interval
+        self.rows: Dict[Any, Dict[str, Any]] = {}
+        self.revision = 0
+        self.full_synced_at = 0.0
+        self.fetched_rows = 0
+
+    def _select(self, supabase):
+        return supabase.table(self.table).select(self.columns)
+
+    def _fetch(self, query: tuple, fn):
+        if self.principal is None:
+            return fn()
+        return single_flight.do((self.principal, self.table, self.columns) + query, fn)
+
+    def _fetch_changes(self, supabase):
+        changed = self._select(supabase).gt("revision", self.revision).execute().data
+        deleted = (
+            supabase.table("deleted_rows")
+            .select("row_id, revision")
+            .eq("table_name", self.table)
+            .gt("revision", self.revision)
+            .execute()
+            .data
+        )
+        return changed, deleted
+
+    def sync(self, supabase) -> List[Dict[str, Any]]:
+        """Bring the copy up to date and return its rows (unordered)."""
+        if not self.full_synced_at or time.time() - self.full_synced_at >= self.full_sync_interval:
+            rows = self._fetch(("full",), lambda: self._select(supabase).execute().data)
+            self.rows = {r["id"]: r for r in rows}
+            self.revision = max((r["revision"] for r in rows), default=0)
+            self.full_synced_at = time.time()
+            self.fetched_rows += len(rows)
+            return list(self.rows.values())
+
+        changed, deleted = self._fetch(("since", self.revision), lambda: self._fetch_changes(supabase))
+        # Apply in revision order so a delete followed by a re-insert (or vice versa) ends up right
+        for change in sorted(changed + deleted, key=lambda r: r["revision"]):
+            if "row_id" in change:
+                self.rows.pop(change["row_id"], None)
+            else:
+                self.rows[change["id"]] = change
+            self.revision = max(self.revision, change["revision"])
+        self.fetched_rows += len(changed) + len(deleted)
+        return list(self.rows.values())
+
+    def invalidate(self) -> None:
+        """Force a full resync on the next call."""
+        self.full_synced_at = 0.0
+
+
+def session_table_sync(table: str, user_id: str, columns: str = "*") -> TableSync:
+    """Return this session's TableSync for a table, starting afresh when the user changes."""
+    # Kept in the memory accountant's store, which may drop it between runs
+    syncs: Dict[str, Any] = memory_accountant.store().setdefault("table_syncs", {})
+    entry: Optional[Dict[str, Any]] = syncs.get(table)
+    if entry is None or entry["user_id"] != user_id:
+        entry = {"user_id": user_id, "sync": TableSync(table, columns, principal=user_id)}
+        syncs[table] = entry
+    return entry["sync"]
@@ -0,0 +1,41 @@
+-- Rebuild daily_user_stats from habit_logs, tasks and task_occurrences.
+-- Run once after adding the rollup triggers in supabase_setup.sql, or any time
+-- the rollup needs to be recomputed. Safe to re-run: the table is rebuilt
+-- inside a single transaction while writes to the source tables are blocked.
+
+begin;
+
+lock table habit_logs, tasks, task_occurrences in share mode;
+
+-- Tasks created before completed_at existed count as completed on creation day
+update tasks set completed_at = created_at
+  where status = 'completed' and completed_at is null;
+
+truncate daily_user_stats;
+
+insert into daily_user_stats (user_id, day, habits_done, tasks_completed, tasks_created)
+select user_id, day, sum(habits_done), sum(tasks_completed), sum(tasks_created)
+from (
+  select user_id, completed_date as day, count(*) as habits_done, 0 as tasks_completed, 0 as tasks_created
+    from habit_logs
+    where user_id is not null and completed_date is not null
+    group by user_id, completed_date
+  union all
+  select user_id, stats_day(completed_at), 0, count(*), 0
+    from tasks
+    where user_id is not null and completed_at is not null
+    group by user_id, stats_day(completed_at)
+  union all
+  select user_id, stats_day(completed_at), 0, count(*), 0
+    from task_occurrences
+    where user_id is not null and completed_at is not null
+    group by user_id, stats_day(completed_at)
+  union all
+  select user_id, stats_day(created_at), 0, 0, count(*)
+    from tasks
+    where user_id is not null and created_at is not null
+    group by user_id, stats_day(created_at)
+) as counts
+group by user_id, day;
+
+commit;
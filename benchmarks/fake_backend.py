@@ -0,0 +1,537 @@
+import copy
+import itertools
+import re
+import threading
+import uuid
+from collections import Counter, defaultdict
+from datetime import date, datetime, time, timedelta
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+from app.agenda import priority_rank
+from app.bitmaps import HabitBitmap
+from app.progress import period_bounds
+from app.search import MATCH_START, MATCH_STOP
+
+
+class FakeResponse:
+    """Mimics the postgrest APIResponse shape (data + count)."""
+
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _parse_columns(columns: str):
+    """Split a PostgREST select string into plain columns and embedded relations."""
+    plain, embeds, depth, token = [], [], 0, ""
+    for ch in columns + ",":
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0:
+            token = token.strip()
+            if "(" in token:
+                name, inner = token.split("(", 1)
+                embeds.append((name.strip(), inner[:-1]))
+            elif token:
+                plain.append(token)
+            token = ""
+        else:
+            token += ch
+    return plain, embeds
+
+
+def _coerce(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+class FakeQuery:
+    """Chainable query builder over one in-memory table."""
+
+    def __init__(self, backend: "FakeSupabase", table: str):
+        self.backend = backend
+        self.table = table
+        self.op = "select"
+        self.columns = "*"
+        self.count_mode = None
+        self.head = False
+        self.filters: List[Callable[[Dict[str, Any]], bool]] = []
+        self.orders: List[tuple] = []
+        self.limit_n: Optional[int] = None
+        self.offset_n = 0
+        self.payload: Any = None
+        self.single_row = False
+        self.on_conflict: Optional[str] = None
+        self.ignore_duplicates = False
+        self._negate = False
+
+    # Operations
+    def select(self, *columns, count=None, head=None):
+        self.columns = ", ".join(columns) if columns else "*"
+        self.count_mode = count
+        self.head = bool(head)
+        return self
+
+    def insert(self, payload, **_):
+        self.op, self.payload = "insert", payload
+        return self
+
+    def upsert(self, payload, on_conflict=None, ignore_duplicates=False, **_):
+        self.op, self.payload, self.on_conflict = "upsert", payload, on_conflict
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, payload, **_):
+        self.op, self.payload = "update", payload
+        return self
+
+    def delete(self, **_):
+        self.op = "delete"
+        return self
+
+    # Filters
+    @property
+    def not_(self):
+        self._negate = True
+        return self
+
+    def _add(self, col, pred):
+        negate, self._negate = self._negate, False
+        self.filters.append(lambda r: pred(_coerce(r.get(col))) != negate)
+        return self
+
+    def eq(self, col, val):
+        return self._add(col, lambda v: v == _coerce(val))
+
+    def neq(self, col, val):
+        return self._add(col, lambda v: v != _coerce(val))
+
+    def lt(self, col, val):
+        return self._add(col, lambda v: v is not None and v < _coerce(val))
+
+    def lte(self, col, val):
+        return self._add(col, lambda v: v is not None and v <= _coerce(val))
+
+    def gt(self, col, val):
+        return self._add(col, lambda v: v is not None and v > _coerce(val))
+
+    def gte(self, col, val):
+        return self._add(col, lambda v: v is not None and v >= _coerce(val))
+
+    def in_(self, col, values):
+        values = [_coerce(v) for v in values]
+        return self._add(col, lambda v: v in values)
+
+    def is_(self, col, val):
+        target = None if val in (None, "null") else val
+        return self._add(col, lambda v: v is target or v == target)
+
+    def order(self, col, desc=False, **_):
+        self.orders.append((col, desc))
+        return self
+
+    def limit(self, n, **_):
+        self.limit_n = n
+        return self
+
+    def range(self, start, end, **_):
+        self.offset_n, self.limit_n = start, end - start + 1
+        return self
+
+    def single(self):
+        self.single_row = True
+        return self
+
+    def maybe_single(self):
+        self.single_row = True
+        return self
+
+    def execute(self):
+        return self.backend._execute(self)
+
+
+class FakeAuth:
+    def __init__(self, backend: "FakeSupabase"):
+        self.backend = backend
+
+    def _session(self, user):
+        return SimpleNamespace(access_token=f"access:{user.id}", refresh_token=f"refresh:{user.id}:{uuid.uuid4().hex[:8]}")
+
+    def sign_in_with_password(self, credentials):
+        self.backend._count("auth.sign_in")
+        user = self.backend.auth_users.get(credentials["email"])
+        if not user or user.password != credentials["password"]:
+            raise ValueError("Invalid login credentials")
+        return SimpleNamespace(user=user, session=self._session(user))
+
+    def sign_up(self, credentials):
+        self.backend._count("auth.sign_up")
+        user = self.backend.add_user(credentials["email"], credentials["password"],
+                                     credentials.get("options", {}).get("data", {}).get("full_name"),
+                                     create_profile=False)
+        return SimpleNamespace(user=user, session=self._session(user))
+
+    def set_session(self, access_token, refresh_token):
+        self.backend._count("auth.set_session")
+
+    def refresh_session(self, refresh_token=None):
+        self.backend._count("auth.refresh")
+        parts = (refresh_token or "").split(":")
+        user_id = parts[1] if len(parts) == 3 else None
+        user = next((u for u in self.backend.auth_users.values() if u.id == user_id), None)
+        if user is None:
+            raise ValueError("Invalid refresh token")
+        return SimpleNamespace(user=user, session=self._session(user))
+
+    def sign_out(self):
+        self.backend._count("auth.sign_out")
+
+
+class FakeSupabase:
+    """
+    In-memory stand-in for the Supabase client used by streamlit_app.py.
+
+    Tables are lists of dicts; the query builder supports the subset of the
+    PostgREST API the app uses. Triggers and RPCs can be registered to mirror
+    the server-side logic from supabase_setup.sql. Every request is counted so
+    load tests can report backend request volume.
+
+    Row level security is emulated when a principal callable is given: it
+    returns the current user's id, and reads/writes only see rows owned by
+    that user (rows without a user_id column are visible to everyone).
+    """
+
+    def __init__(self, principal: Optional[Callable[[], Optional[str]]] = None):
+        self.principal = principal
+        self.tables: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self.auth_users: Dict[str, Any] = {}
+        self.triggers: Dict[str, List[Callable]] = defaultdict(list)
+        self.rpcs: Dict[str, Callable] = {}
+        self.sequences: Dict[str, Any] = defaultdict(lambda: itertools.count(1))
+        self.requests: Counter = Counter()
+        self.auth = FakeAuth(self)
+        self._lock = threading.RLock()
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.requests[key] += 1
+
+    def add_user(self, email, password, full_name=None, role="user", create_profile=True):
+        user = SimpleNamespace(id=str(uuid.uuid4()), email=email, password=password,
+                               user_metadata={"full_name": full_name} if full_name else {})
+        self.auth_users[email] = user
+        if create_profile:
+            self.tables["users"].append({"id": user.id, "email": email, "role": role})
+        return user
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def from_(self, name: str) -> FakeQuery:
+        return self.table(name)
+
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None):
+        backend = self
+
+        class _Rpc:
+            def execute(self_inner):
+                backend._count(f"rpc.{name}")
+                return FakeResponse(backend.rpcs[name](backend, **(params or {})))
+
+        return _Rpc()
+
+    def _execute(self, q: FakeQuery) -> FakeResponse:
+        self._count(f"{q.op}.{q.table}")
+        with self._lock:
+            rows = self.tables[q.table]
+            if q.op == "insert" or q.op == "upsert":
+                payload = q.payload if isinstance(q.payload, list) else [q.payload]
+                inserted = []
+                for item in payload:
+                    row = {k: _coerce(v) for k, v in item.items()}
+                    row.setdefault("id", str(uuid.uuid4()))
+                    if q.op == "upsert":
+                        keys = (q.on_conflict or "id").split(",")
+                        existing = next((r for r in rows if all(r.get(k) == row.get(k) for k in keys)), None)
+                        if existing is not None and q.ignore_duplicates:
+                            continue
+                        if existing is not None:
+                            old = dict(existing)
+                            existing.update(row)
+                            self._fire(q.table, "UPDATE", old, existing)
+                            inserted.append(dict(existing))
+                            continue
+                    rows.append(row)
+                    self._fire(q.table, "INSERT", None, row)
+                    inserted.append(dict(row))
+                return FakeResponse(inserted)
+
+            owner = self.principal() if self.principal else None
+            matched = [r for r in rows if self._visible(q.table, r, owner) and all(f(r) for f in q.filters)]
+            if q.op == "update":
+                for r in matched:
+                    old = dict(r)
+                    r.update({k: _coerce(v) for k, v in q.payload.items()})
+                    self._fire(q.table, "UPDATE", old, r)
+                return FakeResponse([dict(r) for r in matched])
+            if q.op == "delete":
+                for r in matched:
+                    rows.remove(r)
+                    self._fire(q.table, "DELETE", r, None)
+                return FakeResponse([dict(r) for r in matched])
+
+            for col, desc in reversed(q.orders):
+                matched.sort(key=lambda r: (r.get(col) is None, r.get(col) if r.get(col) is not None else 0), reverse=desc)
+            count = len(matched) if q.count_mode else None
+            matched = matched[q.offset_n:]
+            if q.limit_n is not None:
+                matched = matched[:q.limit_n]
+            data = [] if q.head else [self._project(q.table, r, q.columns) for r in matched]
+            if q.single_row:
+                data = data[0] if data else None
+            return FakeResponse(data, count)
+
+    @staticmethod
+    def _visible(table: str, row: Dict[str, Any], owner: Optional[str]) -> bool:
+        if owner is None:
+            return True
+        if table == "users":
+            return row.get("id") == owner
+        return "user_id" not in row or row["user_id"] == owner
+
+    def _project(self, table: str, row: Dict[str, Any], columns: str) -> Dict[str, Any]:
+        plain, embeds = _parse_columns(columns)
+        if "*" in plain:
+            out = copy.deepcopy(row)
+        else:
+            out = {c: copy.deepcopy(row.get(c)) for c in plain}
+        for rel, inner in embeds:
+            fk = row.get(rel.rstrip("s") + "_id")
+            target = next((r for r in self.tables[rel] if r.get("id") == fk), None)
+            out[rel] = self._project(rel, target, inner) if target else None
+        return out
+
+    def _fire(self, table: str, op: str, old, new) -> None:
+        for trigger in self.triggers[table]:
+            trigger(self, op, old, new)
+
+
+# --- Server-side logic from supabase_setup.sql ---
+
+def _bitmap_trigger(backend: FakeSupabase, op: str, old, new) -> None:
+    """habit_logs -> habit_bitmaps, as sync_habit_bitmap() does."""
+    bitmaps = backend.tables["habit_bitmaps"]
+
+    def find(row, day):
+        return next((b for b in bitmaps if b["habit_id"] == row["habit_id"] and b["year"] == day.year), None)
+
+    if old and old.get("completed_date"):
+        day = date.fromisoformat(old["completed_date"])
+        # Only clear the bit if no other log remains for that habit and day
+        remaining = any(l["habit_id"] == old["habit_id"] and l.get("completed_date") == old["completed_date"]
+                        and l.get("id") != old.get("id") for l in backend.tables["habit_logs"])
+        entry = find(old, day)
+        if entry is not None and not remaining:
+            bitmap = HabitBitmap(day.year, entry["bits"])
+            bitmap.clear(day)
+            entry["bits"] = "\\x" + bitmap.bits.hex()
+
+    if new and new.get("completed_date"):
+        day = date.fromisoformat(new["completed_date"])
+        entry = find(new, day)
+        if entry is None:
+            entry = {"habit_id": new["habit_id"], "year": day.year, "user_id": new.get("user_id"), "bits": None}
+            bitmaps.append(entry)
+        bitmap = HabitBitmap(day.year, entry["bits"])
+        bitmap.set(day)
+        entry["bits"] = "\\x" + bitmap.bits.hex()
+
+
+def _bump_stats(backend: FakeSupabase, user_id, day, column: str, delta: int) -> None:
+    if not user_id or not day:
+        return
+    day = str(day)[:10]
+    stats = backend.tables["daily_user_stats"]
+    row = next((r for r in stats if r["user_id"] == user_id and r["day"] == day), None)
+    if row is None:
+        row = {"user_id": user_id, "day": day, "habits_done": 0, "tasks_completed": 0, "tasks_created": 0}
+        stats.append(row)
+    row[column] += delta
+
+
+def _habit_stats_trigger(backend: FakeSupabase, op: str, old, new) -> None:
+    """habit_logs -> daily_user_stats.habits_done, as rollup_habit_log_stats() does."""
+    if old:
+        _bump_stats(backend, old.get("user_id"), old.get("completed_date"), "habits_done", -1)
+    if new:
+        _bump_stats(backend, new.get("user_id"), new.get("completed_date"), "habits_done", 1)
+
+
+def _task_stats_trigger(backend: FakeSupabase, op: str, old, new) -> None:
+    """tasks -> completed_at stamping and daily_user_stats, as the tasks triggers do."""
+    if new is not None:
+        new.setdefault("created_at", datetime.now().isoformat())
+        if new.get("status") == "completed" and not new.get("completed_at"):
+            new["completed_at"] = datetime.now().isoformat()
+        elif new.get("status") != "completed":
+            new["completed_at"] = None
+    if old:
+        _bump_stats(backend, old.get("user_id"), old.get("created_at"), "tasks_created", -1)
+        _bump_stats(backend, old.get("user_id"), old.get("completed_at"), "tasks_completed", -1)
+    if new:
+        _bump_stats(backend, new.get("user_id"), new.get("created_at"), "tasks_created", 1)
+        _bump_stats(backend, new.get("user_id"), new.get("completed_at"), "tasks_completed", 1)
+
+
+def _occurrence_stats_trigger(backend: FakeSupabase, op: str, old, new) -> None:
+    """task_occurrences -> daily_user_stats.tasks_completed, as rollup_task_occurrence_stats() does."""
+    if new is not None:
+        new.setdefault("completed_at", datetime.now().isoformat())
+    if old:
+        _bump_stats(backend, old.get("user_id"), old.get("completed_at"), "tasks_completed", -1)
+    if new:
+        _bump_stats(backend, new.get("user_id"), new.get("completed_at"), "tasks_completed", 1)
+
+
+def _revision_trigger(table: str) -> Callable:
+    """revision/updated_at stamping and deleted_rows tombstones, as the delta sync triggers do."""
+
+    def trigger(backend: FakeSupabase, op: str, old, new) -> None:
+        revision = next(backend.sequences["row_revision_seq"])
+        if new is not None:
+            new["revision"] = revision
+            new["updated_at"] = datetime.now().isoformat()
+            return
+        tombstones = backend.tables["deleted_rows"]
+        tombstones[:] = [t for t in tombstones if (t["table_name"], t["row_id"]) != (table, old["id"])]
+        tombstones.append({"table_name": table, "row_id": old["id"], "user_id": old.get("user_id"),
+                           "revision": revision, "deleted_at": datetime.now().isoformat()})
+
+    return trigger
+
+
+def _priority_rank_trigger(backend: FakeSupabase, op: str, old, new) -> None:
+    """tasks.priority_rank, a generated column in supabase_setup.sql."""
+    if new is not None:
+        new["priority_rank"] = priority_rank(new.get("priority"))
+
+
+def _agenda_key(row: Dict[str, Any]) -> tuple:
+    return (row.get("priority_rank", priority_rank(row.get("priority"))), row.get("due_date") or "9999-12-31",
+            row.get("due_time") or "24:00:00", row.get("created_at") or "", row["id"])
+
+
+def _agenda_rpc(backend: FakeSupabase, p_limit: int = 10, p_after_rank=None, p_after_due=None,
+                p_after_time=None, p_after_created=None, p_after_id=None):
+    """Stand-in for agenda(): same ordering and keyset semantics, by sorting in memory."""
+    owner = backend.principal() if backend.principal else None
+    rows = [r for r in backend.tables["tasks"] if backend._visible("tasks", r, owner)
+            and r.get("status") != "completed" and not r.get("recurrence_rule")]
+    if p_after_id is not None:
+        after = _agenda_key({"priority_rank": p_after_rank, "due_date": p_after_due, "due_time": p_after_time,
+                             "created_at": p_after_created, "id": p_after_id})
+        rows = [r for r in rows if _agenda_key(r) > after]
+    return [dict(r) for r in sorted(rows, key=_agenda_key)[:p_limit]]
+
+
+def _search_items_rpc(backend: FakeSupabase, p_query: str, p_limit: int = 20, p_offset: int = 0):
+    """Naive stand-in for search_items(): every word must occur as a substring; rank is the match count."""
+    words = re.findall(r"\w+", p_query.lower())
+    if not words:
+        return []
+    pattern = re.compile("|".join(re.escape(w) for w in words), re.IGNORECASE)
+
+    def mark(value: str) -> str:
+        return pattern.sub(lambda m: MATCH_START + m.group(0) + MATCH_STOP, value)
+
+    owner = backend.principal() if backend.principal else None
+    hits = []
+    for kind, table, column in (("task", "tasks", "title"), ("habit", "habits", "name")):
+        for row in backend.tables[table]:
+            if not backend._visible(table, row, owner):
+                continue
+            title, body = row.get(column) or "", row.get("description") or ""
+            text = f"{title} {body}".lower()
+            if all(w in text for w in words):
+                hits.append({"kind": kind, "id": row["id"], "title": mark(title), "snippet": mark(body),
+                             "rank": float(sum(text.count(w) for w in words))})
+    hits.sort(key=lambda h: -h["rank"])
+    page = hits[p_offset:p_offset + p_limit]
+    for h in page:
+        h["total"] = len(hits)
+    return page
+
+
+def _withdraw_reminder_trigger(backend: FakeSupabase, op: str, old, new) -> None:
+    """habit_logs insert -> drop the habit's pending reminder, as withdraw_habit_reminder() does."""
+    if op == "INSERT":
+        outbox = backend.tables["reminder_outbox"]
+        outbox[:] = [r for r in outbox if not (r["habit_id"] == new.get("habit_id") and r["status"] == "pending"
+                                               and r["remind_on"] == new.get("completed_date"))]
+
+
+def _enqueue_due_reminders_rpc(backend: FakeSupabase, p_now: Optional[str] = None, p_window: str = "1 hour"):
+    """Stand-in for enqueue_due_reminders() with the default one hour window."""
+    now = datetime.fromisoformat(p_now) if p_now else datetime.now()
+    today = now.date().isoformat()
+    window_end = min(now + timedelta(hours=1), datetime.combine(now.date(), datetime.max.time())).time()
+    logged = {l["habit_id"] for l in backend.tables["habit_logs"] if l.get("completed_date") == today}
+    queued = {r["habit_id"] for r in backend.tables["reminder_outbox"] if r["remind_on"] == today}
+    count = 0
+    for habit in backend.tables["habits"]:
+        if not habit.get("reminder_time") or habit["id"] in logged or habit["id"] in queued:
+            continue
+        if now.time() <= time.fromisoformat(habit["reminder_time"]) <= window_end:
+            backend.tables["reminder_outbox"].append({
+                "id": next(backend.sequences["reminder_outbox_id_seq"]), "user_id": habit.get("user_id"),
+                "habit_id": habit["id"], "habit_name": habit.get("name"), "remind_on": today,
+                "reminder_time": habit["reminder_time"], "status": "pending", "delivered_at": None,
+            })
+            count += 1
+    return count
+
+
+def _purge_tombstones_rpc(backend: FakeSupabase, p_retention: str = "86400 seconds"):
+    """Stand-in for purge_tombstones(); the retention is given in seconds."""
+    cutoff = datetime.now() - timedelta(seconds=float(p_retention.split()[0]))
+    tombstones = backend.tables["deleted_rows"]
+    kept = [t for t in tombstones if datetime.fromisoformat(t["deleted_at"]) >= cutoff]
+    purged = len(tombstones) - len(kept)
+    tombstones[:] = kept
+    return purged
+
+
+def _habit_period_progress_rpc(backend: FakeSupabase, p_today: Optional[str] = None):
+    """Stand-in for habit_period_progress(): counts each visible habit's logs in its current period."""
+    today = date.fromisoformat(p_today) if p_today else date.today()
+    owner = backend.principal() if backend.principal else None
+    rows = []
+    for habit in backend.tables["habits"]:
+        if not backend._visible("habits", habit, owner):
+            continue
+        start, end = period_bounds(habit.get("frequency"), today)
+        done = sum(1 for l in backend.tables["habit_logs"] if l.get("habit_id") == habit["id"]
+                   and start.isoformat() <= l.get("completed_date", "") <= end.isoformat())
+        target = habit.get("target_count") or 1
+        rows.append({"habit_id": habit["id"], "period_start": start.isoformat(), "period_end": end.isoformat(),
+                     "done": done, "target": target, "remaining": max(target - done, 0),
+                     "progress": min(done / target, 1.0)})
+    return rows
+
+
+def install_schema_logic(backend: FakeSupabase) -> FakeSupabase:
+    """Register the triggers and RPCs defined in supabase_setup.sql on a fake backend."""
+    backend.triggers["habit_logs"] += [_bitmap_trigger, _habit_stats_trigger, _withdraw_reminder_trigger]
+    backend.triggers["tasks"] += [_priority_rank_trigger, _task_stats_trigger, _revision_trigger("tasks")]
+    backend.triggers["habits"].append(_revision_trigger("habits"))
+    backend.triggers["task_occurrences"].append(_occurrence_stats_trigger)
+    backend.rpcs["search_items"] = _search_items_rpc
+    backend.rpcs["agenda"] = _agenda_rpc
+    backend.rpcs["enqueue_due_reminders"] = _enqueue_due_reminders_rpc
+    backend.rpcs["purge_tombstones"] = _purge_tombstones_rpc
+    backend.rpcs["habit_period_progress"] = _habit_period_progress_rpc
+    return backend
@@ -0,0 +1,225 @@
+"""
+Concurrent-session load test for streamlit_app.py.
+
+Drives N simulated sessions through Streamlit's AppTest API against the
+in-memory FakeSupabase backend. Each session logs in, views the dashboard,
+checks in a habit and creates a task. For every session count the report
+shows rerun latency percentiles, throughput, memory per session and the
+number of backend requests.
+
+AppTest keeps a process-global runtime, so reruns are serialized through a
+lock while every session stays resident. Latency includes the time a rerun
+waits for that lock, which approximates one Streamlit process serving N tabs
+under the GIL; "svc ms" is the mean time spent actually executing a rerun.
+
+    python -m benchmarks.loadtest --sessions 1,10,50,200
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from streamlit.testing.v1 import AppTest
+
+from app import client
+from .fake_backend import FakeSupabase, install_schema_logic
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_app.py")
+PASSWORD = "load-test-password"
+
+# AppTest.run() is not thread-safe; see the module docstring
+RUN_LOCK = threading.Lock()
+
+
+def current_principal() -> Optional[str]:
+    """Return the logged-in user id of the session whose script is running on this thread."""
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return None
+    try:
+        user = ctx.session_state["user"]
+    except KeyError:
+        return None
+    return user["id"] if user else None
+
+
+def seed_backend(users: int, habits_per_user: int, tasks_per_user: int) -> FakeSupabase:
+    """Create a fake backend with the given number of users, each owning habits, tasks and a category."""
+    backend = install_schema_logic(FakeSupabase(principal=current_principal))
+    today = date.today()
+    for i in range(users):
+        user = backend.add_user(f"user{i}@example.com", PASSWORD, full_name=f"User {i}")
+        category_id = f"cat-{i}"
+        backend.tables["categories"].append({"id": category_id, "name": "Personal", "user_id": user.id})
+        for h in range(habits_per_user):
+            backend.tables["habits"].append({
+                "id": f"habit-{i}-{h}", "name": f"Habit {h}", "frequency": "daily",
+                "reminder_time": "09:00:00", "user_id": user.id,
+            })
+        for t in range(tasks_per_user):
+            backend.table("tasks").insert({
+                "id": f"task-{i}-{t}", "title": f"Task {t}", "description": "",
+                "due_date": (today + timedelta(days=t - tasks_per_user // 2)).isoformat(),
+                "priority": ("low", "medium", "high")[t % 3], "status": "pending",
+                "user_id": user.id, "category_id": category_id,
+            }).execute()
+    backend.requests.clear()
+    return backend
+
+
+class Session:
+    """One simulated browser tab driving the app through AppTest."""
+
+    def __init__(self, index: int, timeout: float):
+        self.email = f"user{index}@example.com"
+        self.at = AppTest.from_file(SCRIPT_PATH, default_timeout=timeout)
+        self.at.session_state["notification_permission_requested"] = True
+        self.latencies: List[float] = []
+        self.service_times: List[float] = []
+        self.errors = 0
+
+    def _run(self) -> None:
+        queued = time.perf_counter()
+        with RUN_LOCK:
+            start = time.perf_counter()
+            self.at.run()
+            finished = time.perf_counter()
+        self.latencies.append(finished - queued)
+        self.service_times.append(finished - start)
+        if self.at.exception:
+            self.errors += 1
+
+    def _click(self, label: Optional[str] = None, key_prefix: Optional[str] = None) -> bool:
+        for button in self.at.button:
+            if (label and button.label == label) or (key_prefix and (button.key or "").startswith(key_prefix)):
+                button.click()
+                self._run()
+                return True
+        return False
+
+    def _navigate(self, page: str) -> None:
+        self.at.sidebar.radio[0].set_value(page)
+        self._run()
+
+    def login(self) -> None:
+        self._run()
+        self.at.text_input[0].input(self.email)
+        self.at.text_input[1].input(PASSWORD)
+        self._click(label="Sign In")
+
+    def iteration(self, n: int) -> None:
+        self._navigate("Dashboard")
+        self._navigate("Habits")
+        self._click(key_prefix="habit_")
+        self._navigate("Tasks")
+        title = next((t for t in self.at.text_input if t.label == "Task Title"), None)
+        if title is not None:
+            title.input(f"Load test task {n}")
+            self._click(label="Add Task")
+
+
+def run_level(sessions: int, iterations: int, habits: int, tasks: int, timeout: float,
+              trace_memory: bool) -> Dict[str, Any]:
+    """Run one load level with the given number of concurrent sessions and summarize it."""
+    backend = seed_backend(sessions, habits, tasks)
+    client.supabase = backend
+
+    if trace_memory:
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+
+    barrier = threading.Barrier(sessions)
+
+    def drive(index: int) -> Session:
+        session = Session(index, timeout)
+        barrier.wait()
+        session.login()
+        for n in range(iterations):
+            session.iteration(n)
+        return session
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        results = list(pool.map(drive, range(sessions)))
+    elapsed = time.perf_counter() - started
+
+    memory_per_session = None
+    if trace_memory:
+        memory_per_session = (tracemalloc.get_traced_memory()[0] - baseline) / sessions
+        tracemalloc.stop()
+
+    latencies = sorted(l for s in results for l in s.latencies)
+    service_times = [t for s in results for t in s.service_times]
+    total_requests = sum(backend.requests.values())
+    return {
+        "sessions": sessions,
+        "reruns": len(latencies),
+        "errors": sum(s.errors for s in results),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "service_ms": sum(service_times) / len(service_times) * 1000 if service_times else 0.0,
+        "reruns_per_s": len(latencies) / elapsed if elapsed else 0.0,
+        "kib_per_session": memory_per_session / 1024 if memory_per_session is not None else None,
+        "backend_requests": total_requests,
+        "requests_per_rerun": total_requests / len(latencies) if latencies else 0.0,
+        "requests_by_kind": dict(backend.requests.most_common()),
+    }
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[rank - 1]
+
+
+REPORT_HEADER = (f"{'sessions':>8} {'reruns':>7} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+                 f"{'svc ms':>7} {'rerun/s':>8} {'KiB/sess':>9} {'requests':>9} {'req/rerun':>9}")
+
+
+def format_row(r: Dict[str, Any]) -> str:
+    mem = f"{r['kib_per_session']:9.0f}" if r["kib_per_session"] is not None else f"{'-':>9}"
+    return (f"{r['sessions']:>8} {r['reruns']:>7} {r['errors']:>6} {r['p50_ms']:8.1f} {r['p95_ms']:8.1f} "
+            f"{r['p99_ms']:8.1f} {r['service_ms']:7.1f} {r['reruns_per_s']:8.1f} {mem} {r['backend_requests']:>9} "
+            f"{r['requests_per_rerun']:9.2f}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Load test streamlit_app.py with concurrent simulated sessions.")
+    parser.add_argument("--sessions", default="1,10,50,100,200",
+                        help="comma-separated concurrent session counts to run (default: 1,10,50,100,200)")
+    parser.add_argument("--iterations", type=int, default=2, help="dashboard/habit/task loops per session")
+    parser.add_argument("--habits", type=int, default=5, help="habits seeded per user")
+    parser.add_argument("--tasks", type=int, default=20, help="tasks seeded per user")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds before a single rerun is abandoned")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip tracemalloc memory accounting (it slows every rerun)")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON to PATH")
+    args = parser.parse_args(argv)
+
+    # Warm up once so the first level doesn't pay for imports and script compilation
+    run_level(1, 1, args.habits, args.tasks, args.timeout, trace_memory=False)
+
+    print(REPORT_HEADER)
+    print("-" * len(REPORT_HEADER))
+    levels = []
+    for count in (int(n) for n in args.sessions.split(",") if n.strip()):
+        levels.append(run_level(count, args.iterations, args.habits, args.tasks, args.timeout,
+                                trace_memory=not args.no_memory))
+        print(format_row(levels[-1]), flush=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(levels, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Connection pool benchmark for app/database.py.
+
+Runs N concurrent sessions against a Postgres URL, each doing a series of
+short transactions through SQLAlchemy sessions, once per pool configuration:
+"queue" (client-side QueuePool) and "null" (NullPool, a fresh connection per
+checkout, as used behind the transaction pooler). For each configuration and
+session count the report shows transaction latency percentiles, throughput,
+time spent waiting in the pool, new server connections and peak connections
+in use.
+
+Compare the direct connection (port 5432) with the transaction pooler
+(port 6543) by running it once for each URL:
+
+    python -m benchmarks.pool_benchmark --url "$DATABASE_URL" --sessions 1,10,50
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from app.database import (DATABASE_URL, DB_MAX_OVERFLOW, DB_POOL_SIZE, create_app_engine, pool_stats,
+                          uses_transaction_pooler)
+from .loadtest import percentile
+
+CONFIGURATIONS = ("queue", "null")
+
+
+def run_level(url: str, pooling: str, sessions: int, transactions: int, query: str,
+              think: float) -> Dict[str, Any]:
+    """Run one configuration at one concurrency level on a fresh engine."""
+    engine = create_app_engine(url, pooling)
+    factory = sessionmaker(bind=engine)
+    latencies: List[float] = []
+    errors = 0
+
+    def session_loop(_: int) -> None:
+        nonlocal errors
+        for _ in range(transactions):
+            started = time.perf_counter()
+            try:
+                with factory() as db:
+                    db.execute(text(query)).all()
+                    db.commit()
+                latencies.append(time.perf_counter() - started)
+            except Exception:
+                errors += 1
+            if think:
+                time.sleep(think)
+
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=sessions) as executor:
+            list(executor.map(session_loop, range(sessions)))
+        elapsed = time.perf_counter() - started
+        stats = pool_stats(engine)
+    finally:
+        engine.dispose()
+
+    latencies.sort()
+    return {
+        "pooling": pooling,
+        "sessions": sessions,
+        "transactions": len(latencies),
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "tx_per_s": len(latencies) / elapsed if elapsed else 0.0,
+        "wait_avg_ms": stats["wait_avg_ms"],
+        "wait_max_ms": stats["wait_max_ms"],
+        "connects": stats["connects"],
+        "peak_in_use": stats["peak_in_use"],
+    }
+
+
+REPORT_HEADER = (f"{'pool':>6} {'sessions':>8} {'tx':>7} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+                 f"{'tx/s':>8} {'wait ms':>8} {'wait max':>8} {'connects':>8} {'peak use':>8}")
+
+
+def format_row(r: Dict[str, Any]) -> str:
+    return (f"{r['pooling']:>6} {r['sessions']:>8} {r['transactions']:>7} {r['errors']:>6} {r['p50_ms']:8.1f} "
+            f"{r['p95_ms']:8.1f} {r['p99_ms']:8.1f} {r['tx_per_s']:8.1f} {r['wait_avg_ms']:8.2f} "
+            f"{r['wait_max_ms']:8.1f} {r['connects']:>8} {r['peak_in_use']:>8}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Compare connection pool configurations under concurrent sessions.")
+    parser.add_argument("--url", default=DATABASE_URL, help="Postgres URL to benchmark (default: DATABASE_URL)")
+    parser.add_argument("--sessions", default="1,10,50",
+                        help="comma-separated concurrent session counts to run (default: 1,10,50)")
+    parser.add_argument("--transactions", type=int, default=50, help="transactions per session")
+    parser.add_argument("--query", default="select 1", help="statement each transaction runs")
+    parser.add_argument("--think", type=float, default=0.0, help="seconds each session pauses between transactions")
+    parser.add_argument("--pooling", default=",".join(CONFIGURATIONS),
+                        help="comma-separated pool configurations to compare (default: queue,null)")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON to PATH")
+    args = parser.parse_args(argv)
+
+    if "sqlite" in args.url:
+        raise SystemExit("The pool benchmark needs a Postgres URL")
+    mode = "transaction pooler" if uses_transaction_pooler(args.url) else "direct connection"
+    print(f"{mode}, pool_size={DB_POOL_SIZE}, max_overflow={DB_MAX_OVERFLOW}")
+
+    print(REPORT_HEADER)
+    print("-" * len(REPORT_HEADER))
+    levels = []
+    for pooling in (p.strip() for p in args.pooling.split(",") if p.strip()):
+        for count in (int(n) for n in args.sessions.split(",") if n.strip()):
+            levels.append(run_level(args.url, pooling, count, args.transactions, args.query, args.think))
+            print(format_row(levels[-1]), flush=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(levels, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,11 @@
 ﻿# -*- coding: utf-8 -*-
 import streamlit as st
+from streamlit.errors import StreamlitAPIException
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 import sys
 import os
-from datetime import datetime, date, timedelta
-import time
+import calendar
+from datetime import date, timedelta
 
 # --- PATH SETUP to import backend modules ---
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -16,6 +15,20 @@ sys.path.append(parent_dir)
 # Import Supabase client
 try:
     from app.client import get_supabase_client
+    from app.bitmaps import HabitBitmap, load_bitmaps
+    from app.stats import get_daily_stats
+    from app.charts import activity_bar, figure_cache, status_donut
+    from app.cache import shared_cache
+    from app.notifications import notify, poll_reminder_outbox, render_notifications
+    from app.recurrence import RecurrenceRule, complete_occurrence, expand_tasks, fetch_completed_occurrences
+    from app.search import highlight_html, search_supabase
+    from app.agenda import fetch_agenda, priority_rank
+    from app.progress import PERIOD_LABELS, fetch_period_progress
+    from app.insights import fetch_latest_insights
+    from app.session_resume import forget_session, remember_session, resume_session, write_resume_cookie
+    from app.sync import session_table_sync
+    from app.memory import memory_accountant
+    from app.singleflight import single_flight
 except ImportError as e:
     st.error(f"Error importing backend modules: {e}")
     st.stop()
@@ -222,80 +235,67 @@ theme_css = f"""
     }}
 </style>
 
-<script>
-    // Function to show browser notification
-    function showBrowserNotification(title, body) {{
-        if ('Notification' in window && Notification.permission === 'granted') {{
-            new Notification(title, {{
-                body: body,
-                icon: 'data:image/svg+xml;base64,PHN2ZyB3aWR0aD0iNjQiIGhlaWdodD0iNjQiIHZpZXdCb3g9IjAgMCA2NCA2NCIgZmlsbD0ibm9uZSIgeG1sbnM9Imh0dHA6Ly93d3cudzMub3JnLzIwMDAvc3ZnIj4KPGNpcmNsZSBjeD0iMzIiIGN5PSIzMiIgcj0iMzIiIGZpbGw9IiMyMmM1NWUiLz4KPHBhdGggZD0iTTI0IDI0SDE2VjE2SDE2VjI0SDE2VjMySDE2VjQwSDE2VjQ4SDE2VjU2SDE2VjY0SDE2VjcySDE2VjgwSDE2VjkySDE2VjEwNFoiIGZpbGw9IndoaXRlIi8+Cjwvc3ZnPgo=',
-                badge: 'data:image/svg+xml;base64,PHN2ZyB3aWR0aD0iNjQiIGhlaWdodD0iNjQiIHZpZXdCb3g9IjAgMCA2NCA2NCIgZmlsbD0ibm9uZSIgeG1sbnM9Imh0dHA6Ly93d3cudzMub3JnLzIwMDAvc3ZnIj4KPGNpcmNsZSBjeD0iMzIiIGN5PSIzMiIgcj0iMzIiIGZpbGw9IiMyMmM1NWUiLz4KPHBhdGggZD0iTTI0IDI0SDE2VjE2SDE2VjI0SDE2VjMySDE2VjQwSDE2VjQ4SDE2VjU2SDE2VjY0SDE2VjcySDE2VjgwSDE2VjkySDE2VjEwNFoiIGZpbGw9IndoaXRlIi8+Cjwvc3ZnPgo='
-            }});
-        }}
-    }}
-    
-    // Make function globally available
-    window.showBrowserNotification = showBrowserNotification;
-</script>
 """
 
 st.markdown(theme_css, unsafe_allow_html=True)
 
 # --- NOTIFICATION FUNCTIONS ---
 def show_notification(title, message):
-    """Show a browser notification"""
-    notification_html = f"""
-    <div class="notification" id="notification_{hash(title + message)}">
-        <strong>{title}</strong><br>
-        {message}
-    </div>
-    <script>
-        setTimeout(() => {{
-            const notif = document.getElementById('notification_{hash(title + message)}');
-            if (notif) notif.remove();
-        }}, 4000);
-        
-        // Also show browser notification if supported
-        if (typeof showBrowserNotification !== 'undefined') {{
-            showBrowserNotification('{title}', '{message}');
-        }}
-    </script>
-    """
-    st.markdown(notification_html, unsafe_allow_html=True)
+    """Queue a notification; queued notifications are rendered once per rerun"""
+    notify(title, message)
 
 def check_habit_reminders():
-    """Check for habit reminders that are due within 1 hour"""
+    """Queue reminders that the reminder worker has put in this user's outbox"""
     user = st.session_state.user
     if not user:
         return
-    
-    supabase = get_client()
-    now = datetime.now()
-    one_hour_later = now + timedelta(hours=1)
-    
-    # Get habits with reminder times
-    habits = supabase.table("habits").select("*").eq("user_id", user['id']).execute().data
-    
-    for habit in habits:
-        if habit.get('reminder_time'):
-            reminder_time = datetime.strptime(habit['reminder_time'], '%H:%M:%S').time()
-            reminder_datetime = datetime.combine(date.today(), reminder_time)
-            
-            if now <= reminder_datetime <= one_hour_later:
-                # Check if already completed today
-                today_str = date.today().isoformat()
-                completed_today = supabase.table("habit_logs").select("*").eq("habit_id", habit['id']).eq("completed_date", today_str).execute().data
-                
-                if not completed_today:
-                    show_notification(
-                        "Habit Reminder", 
-                        f"Don't forget to complete your habit: {habit['name']}"
-                    )
+    poll_reminder_outbox(get_client(), user['id'])
 
 # --- SUPABASE HELPERS ---
 def get_client():
     return get_supabase_client()
 
+# Reference data is read through the shared cache so every worker on the host
+# reuses one fetch. Namespaces are per user; writes call shared_cache.invalidate().
+def fetch_habits(user_id):
+    return shared_cache.get_or_fetch(
+        f"habits:{user_id}", "all",
+        lambda: get_client().table("habits").select("*").eq("user_id", user_id).execute().data
+    )
+
+def fetch_categories(user_id):
+    return shared_cache.get_or_fetch(
+        f"categories:{user_id}", "all",
+        lambda: get_client().table("categories").select("*").execute().data
+    )
+
+def fetch_profile(user_id):
+    return shared_cache.get_or_fetch(
+        f"profile:{user_id}", "row",
+        lambda: get_client().table("users").select("*").eq("id", user_id).single().execute().data
+    )
+
+# Weekly reports are written by the app.insights batch job, so an hour-old copy is current
+INSIGHTS_CACHE_TTL = 3600
+
+def fetch_insights(user_id):
+    return shared_cache.get_or_fetch(
+        f"insights:{user_id}", "latest",
+        lambda: fetch_latest_insights(get_client(), user_id),
+        ttl=INSIGHTS_CACHE_TTL
+    )
+
+# Recurring tasks are templates expanded only for the requested window
+RECURRING_WINDOW_DAYS = 7
+
+def fetch_recurring_occurrences(user_id, start, end):
+    supabase = get_client()
+    templates = supabase.table("tasks").select("*").not_.is_("recurrence_rule", "null").lte("due_date", end.isoformat()).execute().data
+    if not templates:
+        return []
+    completed = fetch_completed_occurrences(supabase, user_id, start, end)
+    return expand_tasks(templates, start, end, completed)
+
 # --- AUTH FUNCTIONS ---
 def login_user(email, password):
     supabase = get_client()
@@ -309,14 +309,14 @@ def login_user(email, password):
             # Store the session token for authenticated API calls
             if res.session:
                 st.session_state.session_token = res.session.access_token
+                st.session_state.refresh_token = res.session.refresh_token
                 # Set the auth token for subsequent API calls
                 supabase.auth.set_session(res.session.access_token, res.session.refresh_token)
             
             # Safely get role/profile from public.users table
             try:
                 # Select only existing columns to avoid errors if schema is out of sync
-                user_data = supabase.table("users").select("*").eq("id", res.user.id).single().execute()
-                profile = user_data.data
+                profile = fetch_profile(res.user.id)
             except Exception:
                 # If the profile record doesn't exist, provide a default profile
                 profile = {"role": "user"}
@@ -357,6 +357,7 @@ def register_user(email, password, full_name):
                 # Check if full_name column exists (based on current schema it doesn't, but let's be safe)
                 # For now, we omit it since we know it causes errors.
                 supabase.table("users").insert(user_payload).execute()
+                shared_cache.invalidate(f"profile:{res.user.id}")
             except Exception as profile_err:
                 print(f"Profile creation error: {profile_err}")
                 # We don't return False here because the auth account WAS created.
@@ -421,6 +422,10 @@ def login_page():
                             "name": display_name, 
                             "role": user_profile.get("role", "user") if user_profile else "user"
                         }
+                        # Let reloads and new tabs resume this sign-in without the password
+                        refresh_token = st.session_state.pop("refresh_token", None)
+                        if refresh_token:
+                            remember_session(st.session_state.user, refresh_token)
                         st.success("Login successful")
                         st.rerun()
                     else:
@@ -467,42 +472,42 @@ def dashboard_page():
     st.markdown(f"Welcome, {user['name']}")
     
     supabase = get_client()
-    today_str = date.today().isoformat()
+    today = date.today()
+    today_str = today.isoformat()
+    
+    # Daily rollup for the last 7 days: one indexed range read, oldest first
+    week_stats = get_daily_stats(supabase, user['id'], today - timedelta(days=6), today)
     
     # Alerts
-    # Overdue tasks
-    overdue_res = supabase.table("tasks").select("*").lt("due_date", today_str).eq("status", "pending").execute()
-    overdue = overdue_res.data
-    if overdue:
-        st.error(f"You have {len(overdue)} overdue tasks.")
+    # Overdue and due-today only need counts; head=True skips transferring the rows
+    overdue_res = supabase.table("tasks").select("id", count="exact", head=True).lt("due_date", today_str).eq("status", "pending").is_("recurrence_rule", "null").execute()
+    overdue_count = overdue_res.count or 0
+    if overdue_count:
+        st.error(f"You have {overdue_count} overdue tasks.")
     
     # Due today
-    due_today_res = supabase.table("tasks").select("*").eq("due_date", today_str).eq("status", "pending").execute()
-    due_today = due_today_res.data
-    if due_today:
-        st.warning(f"You have {len(due_today)} tasks due today.")
-    
-    # Tasks Stats
-    all_tasks_res = supabase.table("tasks").select("status", count="exact").execute()
-    total_tasks = all_tasks_res.count 
-    # Note: select(count="exact") returns count in .count property if we don't fetch data, but typically we need data or just count.
-    # To get just counts efficiently:
-    # We can separate queries or just get all tasks if dataset is small. For scalability, count queries are better.
+    due_today_res = supabase.table("tasks").select("id", count="exact", head=True).eq("due_date", today_str).eq("status", "pending").is_("recurrence_rule", "null").execute()
+    due_today_count = due_today_res.count or 0
+    due_today_count += sum(1 for o in fetch_recurring_occurrences(user['id'], today, today) if o['status'] == "pending")
+    if due_today_count:
+        st.warning(f"You have {due_today_count} tasks due today.")
+    
+    # Tasks Stats (count-only queries)
+    all_tasks_res = supabase.table("tasks").select("id", count="exact", head=True).execute()
+    total_tasks = all_tasks_res.count or 0
     
     # Pending
-    pending_res = supabase.table("tasks").select("*", count="exact").eq("status", "pending").execute()
-    pending_tasks = pending_res.count
+    pending_res = supabase.table("tasks").select("id", count="exact", head=True).eq("status", "pending").execute()
+    pending_tasks = pending_res.count or 0
     
     # Completed
-    completed_res = supabase.table("tasks").select("*", count="exact").eq("status", "completed").execute()
-    completed_tasks = completed_res.count
+    completed_res = supabase.table("tasks").select("id", count="exact", head=True).eq("status", "completed").execute()
+    completed_tasks = completed_res.count or 0
     
     # Habits
-    habits_res = supabase.table("habits").select("*").execute()
-    habits = habits_res.data
+    habits = fetch_habits(user['id'])
     
-    habit_entries_res = supabase.table("habit_logs").select("*", count="exact").eq("completed_date", today_str).execute()
-    habit_entries_today = habit_entries_res.count
+    habit_entries_today = week_stats[-1]["habits_done"]
     
     # Metrics
     m1, m2, m3, m4 = st.columns(4)
@@ -511,6 +516,12 @@ def dashboard_page():
     m3.metric("Completed", completed_tasks)
     m4.metric("Habits Today", f"{habit_entries_today}/{len(habits)}")
     
+    # Next Up: refetched on every full rerun in one call covering every page that was expanded
+    st.subheader("Next Up")
+    rows, cursor = fetch_agenda(supabase, st.session_state.get("agenda_pages", 1) * AGENDA_PAGE_SIZE)
+    memory_accountant.store()["agenda"] = {"rows": rows, "cursor": cursor}
+    render_agenda()
+    
     # Charts
     st.subheader("Overview")
     c1, c2 = st.columns(2)
@@ -524,32 +535,180 @@ def dashboard_page():
             # Better check existing statuses. User script had 'pending' default.
             # Assuming just pending/completed for now based on simple model, or maybe 'in_progress' exists.
             # Let's simple query for 'in_progress'
-            in_prog_res = supabase.table("tasks").select("*", count="exact").eq("status", "in_progress").execute()
-            values = [pending_tasks, completed_tasks, in_prog_res.count]
+            in_prog_res = supabase.table("tasks").select("id", count="exact", head=True).eq("status", "in_progress").execute()
+            values = [pending_tasks, completed_tasks, in_prog_res.count or 0]
             
-            fig = px.pie(values=values, names=labels, hole=0.6, color_discrete_sequence=['#ef4444', '#22c55e', '#3b82f6'])
-            fig.update_layout(showlegend=True, margin=dict(l=20, r=20, t=20, b=20))
+            # Figures are memoized on their inputs; unchanged numbers reuse the cached figure
+            fig = status_donut(values, labels, ['#ef4444', '#22c55e', '#3b82f6'], st.session_state.theme)
             st.plotly_chart(fig, use_container_width=True, config={'responsive': True})
         else:
             st.info("No tasks created yet.")
 
     with c2:
-        # Habit Streaks (Mock logic for now, or complex query)
-        # Getting last 7 days habit logs
-        last_7_days = [date.today() - timedelta(days=i) for i in range(7)]
-        dates_str = [d.strftime("%a") for d in last_7_days][::-1]
+        # Habit activity for the last 7 days, straight from the daily rollup
+        dates_str = [row["day"].strftime("%a") for row in week_stats]
+        daily_completions = [row["habits_done"] for row in week_stats]
         
-        daily_completions = []
-        for d in last_7_days:
-            # Query count of logs for this date
-            c = supabase.table("habit_logs").select("*", count="exact").eq("completed_date", d.isoformat()).execute().count
-            daily_completions.append(c)
+        fig2 = activity_bar(dates_str, daily_completions, "Habit Activity (Last 7 Days)", st.session_state.theme)
+        st.plotly_chart(fig2, use_container_width=True, config={'responsive': True})
+
+    # Weekly Insights: precomputed by the app.insights batch job, one cached lookup here
+    report = fetch_insights(user['id'])
+    if report:
+        st.subheader(f"Insights for {report['week']}")
+        habits_report, tasks_report, overdue = report['habits'], report['tasks'], report['overdue_trend']
+        i1, i2, i3, i4 = st.columns(4)
+        i1.metric("Best Day", habits_report['best_weekday'] or "-")
+        consistency = habits_report['consistency']
+        i2.metric("Habit Consistency", f"{consistency:.0%}" if consistency is not None else "-",
+                  help=f"{habits_report['done']} of {habits_report['expected']:g} target completions")
+        i3.metric("Tasks Completed", tasks_report['completed'],
+                  delta=tasks_report['completed'] - tasks_report['completed_prev'],
+                  help=f"{tasks_report['per_day']:g} per day, {tasks_report['created']} created. "
+                       "Each completed occurrence of a repeating task counts once.")
+        i4.metric("Overdue", overdue[-1], delta=overdue[-1] - overdue[-2] if len(overdue) > 1 else None,
+                  delta_color="inverse", help="At the end of each of the last weeks: " + ", ".join(map(str, overdue)))
+
+
+# --- PER-ROW FRAGMENTS ---
+# Row actions rerun only their own fragment where they can. The row dict /
+# bitmap passed in is the same object the page fetched, so actions update it in
+# place and the fragment rerun renders the new state without refetching the
+# page. A task can appear in several tabs, each its own fragment, so completing
+# or deleting one reruns the whole page to keep the other copies in step.
+
+def rerun_fragment():
+    """Rerun the current fragment, or the whole app if this is not a fragment rerun."""
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+@st.fragment
+def render_task_card(task, context):
+    if task.get('_deleted'):
+        return
+    supabase = get_client()
+    with st.container():
+        col_a, col_b = st.columns([5, 1])
+        with col_a:
+            st.markdown(f"**{task['title']}**")
+            priority_label = task.get('priority', 'medium').upper()
+            desc = task.get('description') or 'No description'
+            due = task.get('due_date')
+            if task.get('recurrence_rule'):
+                schedule = RecurrenceRule.parse(task['recurrence_rule']).describe()
+                st.caption(f"{schedule} from {due} • {priority_label} • {desc}")
+            else:
+                st.caption(f"Due: {due} • {priority_label} • {desc}")
+        with col_b:
+            if task.get('recurrence_rule'):
+                # Templates are completed per occurrence, not as a whole
+                pass
+            elif task['status'] != "completed":
+                if st.button("Complete", key=f"done_{task['id']}_{context}"):
+                    supabase.table("tasks").update({"status": "completed"}).eq("id", task['id']).execute()
+                    task['status'] = "completed"
+                    show_notification("Task Completed!", f"Congratulations! You completed: {task['title']}")
+                    st.rerun()
+            else:
+                st.write("Done")
+            
+            if st.button("Delete", key=f"del_{task['id']}_{context}"):
+                supabase.table("tasks").delete().eq("id", task['id']).execute()
+                task['_deleted'] = True
+                st.rerun()
+        st.divider()
+
+
+@st.fragment
+def render_occurrence_card(occurrence):
+    with st.container():
+        col_a, col_b = st.columns([5, 1])
+        with col_a:
+            st.markdown(f"**{occurrence['title']}**")
+            priority_label = occurrence.get('priority', 'medium').upper()
+            st.caption(f"Due: {occurrence['due_date']} • {priority_label} • Repeating")
+        with col_b:
+            if occurrence['status'] != "completed":
+                if st.button("Complete", key=f"occ_{occurrence['template_id']}_{occurrence['due_date']}"):
+                    complete_occurrence(get_client(), occurrence, st.session_state.user['id'])
+                    occurrence['status'] = "completed"
+                    show_notification("Task Completed!", f"Congratulations! You completed: {occurrence['title']}")
+                    st.rerun()
+            else:
+                st.write("Done")
+        st.divider()
+
+
+@st.fragment
+def render_habit_row(h, bitmap, previous, progress):
+    user = st.session_state.user
+    today = date.today()
+    with st.container():
+        c1, c2, c3 = st.columns([3, 1, 1])
+        with c1:
+            st.markdown(f"**{h['name']}**")
+            st.caption(f"Target: {progress['target']}x {h['frequency']}")
         
-        daily_completions = daily_completions[::-1]
+        # Check if done today
+        is_done_today = bitmap.is_set(today)
         
-        fig2 = go.Figure(data=[go.Bar(x=dates_str, y=daily_completions, marker_color='#3b82f6')])
-        fig2.update_layout(title="Habit Activity (Last 7 Days)", margin=dict(l=20, r=20, t=40, b=20))
-        st.plotly_chart(fig2, use_container_width=True, config={'responsive': True})
+        with c2:
+            if not progress['remaining']:
+                st.write("Completed")
+            elif is_done_today and h['frequency'] != "daily":
+                # Weekly and monthly targets count days, so one completion per day
+                st.write("Done today")
+            else:
+                if st.button("Mark Complete", key=f"habit_{h['id']}"):
+                    log = {
+                        "habit_id": h['id'],
+                        "user_id": user['id'],
+                        "completed_date": today.isoformat()
+                    }
+                    get_client().table("habit_logs").insert(log).execute()
+                    bitmap.set(today)
+                    progress['done'] += 1
+                    progress['remaining'] = max(progress['target'] - progress['done'], 0)
+                    progress['progress'] = min(progress['done'] / progress['target'], 1.0)
+                    show_notification("Habit Completed!", f"Great job! You completed: {h['name']}")
+                    rerun_fragment()
+        
+        with c3:
+            streak = bitmap.current_streak(today, previous=previous)
+            st.metric("Streak", streak, help=f"{bitmap.count()} completions this year")
+        
+        label = PERIOD_LABELS.get(h['frequency'], "today")
+        st.progress(progress['progress'],
+                    text=f"{progress['done']}/{progress['target']} {label} · {progress['remaining']} to go")
+        st.divider()
+
+
+AGENDA_PAGE_SIZE = 5
+
+@st.fragment
+def render_agenda():
+    agenda = memory_accountant.store().get("agenda")
+    if agenda is None:
+        # Evicted by the memory accountant; the dashboard refetches it
+        st.rerun()
+    if not agenda["rows"]:
+        st.info("Nothing to do. Enjoy your day!")
+        return
+    for t in agenda["rows"]:
+        due = t.get('due_date') or "No due date"
+        if t.get('due_time'):
+            due += f" {t['due_time'][:5]}"
+        st.markdown(f"**{t['title']}**")
+        st.caption(f"{(t.get('priority') or 'medium').upper()} • Due: {due}")
+    if agenda["cursor"] and st.button("Show more", key="agenda_more"):
+        # Keyset pagination: fetch only the next page after the last row shown
+        rows, cursor = fetch_agenda(get_client(), AGENDA_PAGE_SIZE, agenda["cursor"])
+        agenda["rows"] += rows
+        agenda["cursor"] = cursor
+        st.session_state.agenda_pages = st.session_state.get("agenda_pages", 1) + 1
+        rerun_fragment()
 
 
 def tasks_page():
@@ -567,13 +726,16 @@ def tasks_page():
             with c2: t_priority = st.selectbox("Priority", ["low", "medium", "high"])
             with c3: 
                 # Fetch categories
-                cats_res = supabase.table("categories").select("*").execute()
-                cats = cats_res.data
-                t_cat_name = st.selectbox("Category", [c['name'] for c in cats]) if cats else None
+                cats = fetch_categories(user['id'])
+                cat_ids = {c['name']: c['id'] for c in cats}
+                t_cat_name = st.selectbox("Category", list(cat_ids)) if cats else None
+            r1, r2 = st.columns([1, 2])
+            with r1: t_repeat = st.selectbox("Repeat", ["never", "daily", "weekly", "monthly"])
+            with r2: t_repeat_days = st.multiselect("Repeat on (weekly)", list(calendar.day_abbr))
             
             submitted = st.form_submit_button("Add Task", type="primary")
             if submitted and t_title:
-                cat_id = next((c['id'] for c in cats if c['name'] == t_cat_name), None) if t_cat_name else None
+                cat_id = cat_ids.get(t_cat_name)
                 
                 new_task = {
                     "title": t_title,
@@ -584,41 +746,25 @@ def tasks_page():
                     "category_id": cat_id,
                     "status": "pending"
                 }
+                if t_repeat != "never":
+                    # The due date is the first occurrence of the recurring task
+                    by_day = [list(calendar.day_abbr).index(d) for d in t_repeat_days] if t_repeat == "weekly" else None
+                    new_task["recurrence_rule"] = RecurrenceRule(t_repeat.upper(), by_day=by_day).to_string()
                 supabase.table("tasks").insert(new_task).execute()
                 show_notification("Task Added!", f"New task '{t_title}' has been added to your list.")
                 st.success("Task added")
                 st.rerun()
 
     # View Tasks (Tabs)
-    tab1, tab2, tab3 = st.tabs(["Pending", "Completed", "All"])
-    
-    # Fetch all tasks
-    tasks_res = supabase.table("tasks").select("*").order("due_date").execute()
-    tasks = tasks_res.data
-    
-    def render_task_card(task, context):
-        with st.container():
-            col_a, col_b = st.columns([5, 1])
-            with col_a:
-                st.markdown(f"**{task['title']}**")
-                priority_label = task.get('priority', 'medium').upper()
-                desc = task.get('description') or 'No description'
-                due = task.get('due_date')
-                st.caption(f"Due: {due} • {priority_label} • {desc}")
-            with col_b:
-                if task['status'] != "completed":
-                    if st.button("Complete", key=f"done_{task['id']}_{context}"):
-                        supabase.table("tasks").update({"status": "completed"}).eq("id", task['id']).execute()
-                        show_notification("Task Completed!", f"Congratulations! You completed: {task['title']}")
-                        st.rerun()
-                else:
-                    st.write("Done")
-                
-                if st.button("Delete", key=f"del_{task['id']}_{context}"):
-                    supabase.table("tasks").delete().eq("id", task['id']).execute()
-                    st.rerun()
-            st.divider()
-
+    tab1, tab2, tab3, tab4 = st.tabs(["Pending", "Completed", "Recurring", "All"])
+    
+    # Tasks come from the session's synced copy: after the first load only changed rows are fetched
+    all_tasks = session_table_sync("tasks", user['id']).sync(supabase)
+    all_tasks.sort(key=lambda t: (t.get('priority_rank', priority_rank(t.get('priority'))),
+                                  t.get('due_date') or "9999-12-31", t.get('created_at') or ""))
+    templates = [t for t in all_tasks if t.get('recurrence_rule')]
+    tasks = [t for t in all_tasks if not t.get('recurrence_rule')]
+    
     with tab1:
         pending = [t for t in tasks if t['status'] == "pending"]
         if not pending: st.info("No pending tasks.")
@@ -630,10 +776,27 @@ def tasks_page():
         for task in completed: render_task_card(task, "completed")
 
     with tab3:
+        if not templates:
+            st.info("No recurring tasks.")
+        else:
+            # Expand templates for the visible window only
+            today = date.today()
+            window_end = today + timedelta(days=RECURRING_WINDOW_DAYS - 1)
+            completed_occurrences = fetch_completed_occurrences(supabase, user['id'], today, window_end)
+            st.caption(f"Next {RECURRING_WINDOW_DAYS} days")
+            for occurrence in expand_tasks(templates, today, window_end, completed_occurrences):
+                render_occurrence_card(occurrence)
+            st.markdown("**Repeating tasks**")
+            for template in templates: render_task_card(template, "recurring")
+
+    with tab4:
         if not tasks: st.info("No tasks found.")
         for task in tasks: render_task_card(task, "all")
 
 
+# Weekly and monthly targets count days (one completion per day), so they can't exceed the period
+MAX_HABIT_TARGET = {"weekly": 7, "monthly": 28}
+
 def habits_page():
     st.title("Habits")
     user = st.session_state.user
@@ -643,64 +806,46 @@ def habits_page():
     with st.expander("Create New Habit"):
         with st.form("new_habit"):
             h_name = st.text_input("Habit Name")
-            h_freq = st.selectbox("Frequency", ["daily", "weekly"])
+            h_freq = st.selectbox("Frequency", ["daily", "weekly", "monthly"])
+            h_target = st.number_input("Times per period", min_value=1, max_value=max(MAX_HABIT_TARGET.values()),
+                                       value=1, step=1, help="At most 7 for weekly and 28 for monthly habits")
             # Reminder time is in schema? Yes "reminder_time".
             h_time = st.time_input("Reminder Time")
             
             submitted = st.form_submit_button("Start Habit", type="primary")
-            if submitted and h_name:
+            if submitted and h_target > MAX_HABIT_TARGET.get(h_freq, h_target):
+                st.error(f"A {h_freq} habit can be completed at most {MAX_HABIT_TARGET[h_freq]} times per period")
+            elif submitted and h_name:
                 h = {
                     "name": h_name, 
                     "frequency": h_freq, 
+                    "target_count": int(h_target),
                     "reminder_time": h_time.isoformat(),
                     "user_id": user['id']
                 }
                 supabase.table("habits").insert(h).execute()
+                shared_cache.invalidate(f"habits:{user['id']}")
                 show_notification("Habit Added!", f"New habit '{h_name}' has been added to your tracking.")
                 st.success("Habit created")
                 st.rerun()
     
     st.subheader("Your Habits")
-    habits = supabase.table("habits").select("*").execute().data
-    today_str = date.today().isoformat()
+    habits = fetch_habits(user['id'])
+    today = date.today()
     
     if not habits:
         st.info("No habits tracking yet. Add one above.")
 
+    # One bitmap per habit per year replaces per-habit log queries
+    bitmaps = load_bitmaps(supabase, user['id'], [today.year - 1, today.year])
+    # Completions in each habit's current day/week/month, for all habits in one query
+    progress = fetch_period_progress(supabase, today)
+
     for h in habits:
-        with st.container():
-            c1, c2, c3 = st.columns([3, 1, 1])
-            with c1:
-                st.markdown(f"**{h['name']}**")
-                st.caption(f"Target: {h['frequency']}")
-            
-            # Check if done today
-            entry_res = supabase.table("habit_logs").select("*").eq("habit_id", h['id']).eq("completed_date", today_str).execute()
-            entry = entry_res.data
-            is_done_today = len(entry) > 0
-            
-            with c2:
-                if is_done_today:
-                    st.write("Completed")
-                else:
-                    if st.button("Mark Complete", key=f"habit_{h['id']}"):
-                        log = {
-                            "habit_id": h['id'],
-                            "user_id": user['id'],
-                            "completed_date": today_str
-                        }
-                        supabase.table("habit_logs").insert(log).execute()
-                        show_notification("Habit Completed!", f"Great job! You completed: {h['name']}")
-                        st.rerun()
-            
-            with c3:
-                # Count total entries
-                streak = supabase.table("habit_logs").select("*", count="exact").eq("habit_id", h['id']).execute().count
-                st.metric("Total", streak)
-            
-            val = 1.0 if is_done_today else 0.0
-            st.progress(val)
-            st.divider()
+        bitmap = bitmaps.setdefault((h['id'], today.year), HabitBitmap(today.year))
+        target = h.get('target_count') or 1
+        p = progress.get(h['id']) or {"done": 0, "target": target, "remaining": target, "progress": 0.0}
+        render_habit_row(h, bitmap, bitmaps.get((h['id'], today.year - 1)), p)
 
 def calendar_page():
     st.title("Calendar")
@@ -713,7 +858,9 @@ def calendar_page():
     st.subheader(f"Schedule for {selected_date}")
     
     # Tasks
-    tasks = supabase.table("tasks").select("*").eq("due_date", date_str).execute().data
+    tasks = supabase.table("tasks").select("*").eq("due_date", date_str).is_("recurrence_rule", "null").execute().data
+    # Recurring tasks are expanded for the selected day only
+    tasks += fetch_recurring_occurrences(user['id'], selected_date, selected_date)
     if tasks:
         st.markdown("**Tasks**")
         for t in tasks:
@@ -734,13 +881,82 @@ def calendar_page():
             h_name = e.get('habits', {}).get('name', 'Unknown Habit')
             st.success(f"{h_name}")
 
+SEARCH_PAGE_SIZE = 20
+
+def search_page():
+    st.title("Search")
+    supabase = get_client()
+
+    query = st.text_input("Search tasks and habits", placeholder="e.g. groceries, gym, report")
+    # Start from the first page whenever the query changes
+    if st.session_state.get("search_query") != query:
+        st.session_state.search_query = query
+        st.session_state.search_page = 0
+    if not query.strip():
+        st.info("Type to search your tasks and habits. Small typos are tolerated.")
+        return
+
+    page = st.session_state.search_page
+    results, total = search_supabase(supabase, query, SEARCH_PAGE_SIZE, page * SEARCH_PAGE_SIZE)
+    if not total:
+        st.info("No matches found.")
+        return
+
+    first = page * SEARCH_PAGE_SIZE + 1
+    st.caption(f"Showing {first}-{first + len(results) - 1} of {total} results")
+    for r in results:
+        icon = "📝" if r['kind'] == "task" else "🔁"
+        snippet = f"<br><small>{highlight_html(r['snippet'])}</small>" if r.get('snippet') else ""
+        st.markdown(f"{icon} **{highlight_html(r['title'])}**{snippet}", unsafe_allow_html=True)
+
+    c1, c2 = st.columns(2)
+    if c1.button("Previous", disabled=page == 0):
+        st.session_state.search_page -= 1
+        st.rerun()
+    if c2.button("Next", disabled=first + len(results) > total):
+        st.session_state.search_page += 1
+        st.rerun()
+
+def admin_page():
+    st.title("Admin")
+    if st.session_state.user.get('role') != "admin":
+        st.error("Admins only.")
+        return
+
+    st.subheader("Session Memory")
+    mem = memory_accountant.stats()
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Sessions", mem['sessions'])
+    m2.metric("Held", f"{mem['total_bytes'] / 2**20:.1f} MiB", help=f"Budget {mem['global_budget'] / 2**20:.0f} MiB")
+    m3.metric("Per-session budget", f"{mem['session_budget'] / 2**20:.0f} MiB")
+    m4.metric("Evicted", f"{mem['freed_bytes'] / 2**20:.1f} MiB", help=f"{mem['evictions']} evictions")
+    sessions = memory_accountant.sessions()
+    if sessions:
+        st.dataframe(pd.DataFrame(sessions), hide_index=True)
+
+    st.subheader("Caches")
+    figures = figure_cache.stats()
+    shared = shared_cache.stats()
+    flights = single_flight.stats()
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Figure cache", f"{figures['entries']} figures",
+              help=f"{figures['hits']} hits, {figures['misses']} misses")
+    c2.metric("Shared cache hit rate", f"{shared['hit_rate']:.0%}", help=f"{shared['backend']}, {shared['misses']} misses")
+    c3.metric("Coalesced requests", flights['coalesced'], help=f"{flights['executed']} executed")
+
 # --- MAIN APP LOGIC ---
 def main():
+    if not st.session_state.user:
+        # A reload or new tab is a new session; pick up the previous sign-in from its cookie
+        st.session_state.user = resume_session(get_client())
+    write_resume_cookie()
+
     if not st.session_state.user:
         login_page()
     else:
-        # Check for habit reminders
+        # Check for habit reminders, then deliver everything queued in one block
         check_habit_reminders()
+        render_notifications()
         
         # Sidebar Navigation
         with st.sidebar:
@@ -756,11 +972,16 @@ def main():
             st.markdown("---")
             
             # Simplified navigation
-            page = st.radio("Menu", ["Dashboard", "Tasks", "Habits", "Calendar"])
+            pages = ["Dashboard", "Tasks", "Habits", "Calendar", "Search"]
+            if st.session_state.user.get('role') == "admin":
+                pages.append("Admin")
+            page = st.radio("Menu", pages)
             
             st.markdown("---")
             if st.button("Sign Out"):
                 st.session_state.user = None
+                memory_accountant.store().pop("table_syncs", None)
+                forget_session()
                 st.rerun()
         
         if page == "Dashboard":
@@ -771,6 +992,13 @@ def main():
             habits_page()
         elif page == "Calendar":
             calendar_page()
+        elif page == "Search":
+            search_page()
+        elif page == "Admin":
+            admin_page()
+
+        # Measure this session and enforce the memory budgets once the page is built
+        memory_accountant.account(st.session_state.user['email'])
 
 if __name__ == "__main__":
     main()
@@ -82,3 +82,529 @@ create policy "Admins can access all tasks" on tasks
   for all using (
     exists (select 1 from users where id = auth.uid() and role = 'admin')
   );
+
+
+-- Habit Completion Bitmaps
+-- One 366-bit set per habit per year (46 bytes). Bit n is set when the habit
+-- was completed on day-of-year n + 1. Maintained by a trigger on habit_logs so
+-- history views read a few hundred bytes instead of every log row.
+create table if not exists habit_bitmaps (
+  habit_id uuid references habits(id) on delete cascade,
+  year int,
+  bits bytea not null default decode(repeat('00', 46), 'hex'),
+  user_id uuid references auth.users(id),
+  primary key (habit_id, year)
+);
+
+create index if not exists habit_bitmaps_user_year_idx on habit_bitmaps (user_id, year);
+
+alter table habit_bitmaps enable row level security;
+
+create policy "Users can read their own habit bitmaps" on habit_bitmaps
+  for select using (auth.uid() = user_id);
+
+create or replace function sync_habit_bitmap() returns trigger
+language plpgsql security definer set search_path = public as $$
+begin
+  if tg_op in ('DELETE', 'UPDATE') and old.completed_date is not null then
+    -- Only clear the bit if no other log remains for that habit and day
+    if not exists (
+      select 1 from habit_logs
+      where habit_id = old.habit_id and completed_date = old.completed_date and id <> old.id
+    ) then
+      update habit_bitmaps
+        set bits = set_bit(bits, extract(doy from old.completed_date)::int - 1, 0)
+        where habit_id = old.habit_id and year = extract(year from old.completed_date)::int;
+    end if;
+  end if;
+
+  if tg_op in ('INSERT', 'UPDATE') and new.completed_date is not null then
+    insert into habit_bitmaps (habit_id, year, user_id)
+      values (new.habit_id, extract(year from new.completed_date)::int, new.user_id)
+      on conflict (habit_id, year) do nothing;
+    update habit_bitmaps
+      set bits = set_bit(bits, extract(doy from new.completed_date)::int - 1, 1)
+      where habit_id = new.habit_id and year = extract(year from new.completed_date)::int;
+  end if;
+
+  return null;
+end;
+$$;
+
+drop trigger if exists habit_logs_sync_bitmap on habit_logs;
+create trigger habit_logs_sync_bitmap
+  after insert or update or delete on habit_logs
+  for each row execute function sync_habit_bitmap();
+
+-- Backfill bitmaps for logs recorded before the trigger existed
+do $$
+declare
+  l record;
+begin
+  for l in select distinct habit_id, completed_date, user_id from habit_logs where completed_date is not null loop
+    insert into habit_bitmaps (habit_id, year, user_id)
+      values (l.habit_id, extract(year from l.completed_date)::int, l.user_id)
+      on conflict (habit_id, year) do nothing;
+    update habit_bitmaps
+      set bits = set_bit(bits, extract(doy from l.completed_date)::int - 1, 1)
+      where habit_id = l.habit_id and year = extract(year from l.completed_date)::int;
+  end loop;
+end;
+$$;
+
+
+-- Daily User Stats
+-- Per-user, per-day rollup kept current by triggers on habit_logs and tasks,
+-- so dashboard charts read N rows for an N-day range instead of counting logs.
+alter table tasks add column if not exists created_at timestamptz default now();
+alter table tasks add column if not exists completed_at timestamptz;
+
+create table if not exists daily_user_stats (
+  user_id uuid references auth.users(id),
+  day date,
+  habits_done int not null default 0,
+  tasks_completed int not null default 0,
+  tasks_created int not null default 0,
+  primary key (user_id, day)
+);
+
+alter table daily_user_stats enable row level security;
+
+create policy "Users can read their own daily stats" on daily_user_stats
+  for select using (auth.uid() = user_id);
+
+create or replace function bump_daily_user_stats(
+  p_user uuid, p_day date, p_habits_done int, p_tasks_completed int, p_tasks_created int
+) returns void
+language plpgsql security definer set search_path = public as $$
+begin
+  if p_user is null or p_day is null then
+    return;
+  end if;
+  insert into daily_user_stats (user_id, day, habits_done, tasks_completed, tasks_created)
+    values (p_user, p_day, p_habits_done, p_tasks_completed, p_tasks_created)
+    on conflict (user_id, day) do update set
+      habits_done = daily_user_stats.habits_done + excluded.habits_done,
+      tasks_completed = daily_user_stats.tasks_completed + excluded.tasks_completed,
+      tasks_created = daily_user_stats.tasks_created + excluded.tasks_created;
+end;
+$$;
+
+-- Only the triggers below may call it; as an RPC it would let anyone rewrite anyone's stats
+revoke execute on function bump_daily_user_stats(uuid, date, int, int, int) from public, anon, authenticated;
+
+-- Days are calendar days in the app's timezone, the same day date.today()
+-- gives the app (and the one it writes into habit_logs.completed_date).
+-- Set it to the timezone the app runs in, e.g.
+--   alter database postgres set app.timezone = 'Europe/Berlin';
+-- Without the setting days are UTC days, matching a UTC app host.
+create or replace function stats_day(p_ts timestamptz) returns date
+language sql stable as $$
+  select (p_ts at time zone coalesce(nullif(current_setting('app.timezone', true), ''), 'UTC'))::date;
+$$;
+
+-- Stamp completed_at when a task enters or leaves the completed status
+create or replace function stamp_task_completed_at() returns trigger
+language plpgsql as $$
+begin
+  if new.status = 'completed' and (tg_op = 'INSERT' or old.status is distinct from 'completed') then
+    new.completed_at := coalesce(new.completed_at, now());
+  elsif new.status is distinct from 'completed' then
+    new.completed_at := null;
+  end if;
+  return new;
+end;
+$$;
+
+drop trigger if exists tasks_stamp_completed_at on tasks;
+create trigger tasks_stamp_completed_at
+  before insert or update on tasks
+  for each row execute function stamp_task_completed_at();
+
+create or replace function rollup_habit_log_stats() returns trigger
+language plpgsql security definer set search_path = public as $$
+begin
+  if tg_op in ('DELETE', 'UPDATE') then
+    perform bump_daily_user_stats(old.user_id, old.completed_date, -1, 0, 0);
+  end if;
+  if tg_op in ('INSERT', 'UPDATE') then
+    perform bump_daily_user_stats(new.user_id, new.completed_date, 1, 0, 0);
+  end if;
+  return null;
+end;
+$$;
+
+drop trigger if exists habit_logs_rollup_stats on habit_logs;
+create trigger habit_logs_rollup_stats
+  after insert or update or delete on habit_logs
+  for each row execute function rollup_habit_log_stats();
+
+create or replace function rollup_task_stats() returns trigger
+language plpgsql security definer set search_path = public as $$
+begin
+  if tg_op in ('DELETE', 'UPDATE') then
+    perform bump_daily_user_stats(old.user_id, stats_day(old.created_at), 0, 0, -1);
+    perform bump_daily_user_stats(old.user_id, stats_day(old.completed_at), 0, -1, 0);
+  end if;
+  if tg_op in ('INSERT', 'UPDATE') then
+    perform bump_daily_user_stats(new.user_id, stats_day(new.created_at), 0, 0, 1);
+    perform bump_daily_user_stats(new.user_id, stats_day(new.completed_at), 0, 1, 0);
+  end if;
+  return null;
+end;
+$$;
+
+drop trigger if exists tasks_rollup_stats on tasks;
+create trigger tasks_rollup_stats
+  after insert or update or delete on tasks
+  for each row execute function rollup_task_stats();
+
+
+-- Recurring Tasks
+-- A task with a recurrence_rule (RRULE subset, e.g. 'FREQ=WEEKLY;BYDAY=MO,TH')
+-- is a template whose due_date is the first occurrence. Occurrences are
+-- expanded in the app for the visible window; only completed ones are stored.
+alter table tasks add column if not exists recurrence_rule text;
+
+create table if not exists task_occurrences (
+  task_id uuid references tasks(id) on delete cascade,
+  occurrence_date date,
+  status text default 'completed',
+  completed_at timestamptz default now(),
+  user_id uuid references auth.users(id),
+  primary key (task_id, occurrence_date)
+);
+
+create index if not exists task_occurrences_user_date_idx on task_occurrences (user_id, occurrence_date);
+
+alter table task_occurrences enable row level security;
+
+create policy "Users can manage their own task occurrences" on task_occurrences
+  for all using (auth.uid() = user_id) with check (auth.uid() = user_id);
+
+create or replace function rollup_task_occurrence_stats() returns trigger
+language plpgsql security definer set search_path = public as $$
+begin
+  if tg_op in ('DELETE', 'UPDATE') then
+    perform bump_daily_user_stats(old.user_id, stats_day(old.completed_at), 0, -1, 0);
+  end if;
+  if tg_op in ('INSERT', 'UPDATE') then
+    perform bump_daily_user_stats(new.user_id, stats_day(new.completed_at), 0, 1, 0);
+  end if;
+  return null;
+end;
+$$;
+
+drop trigger if exists task_occurrences_rollup_stats on task_occurrences;
+create trigger task_occurrences_rollup_stats
+  after insert or update or delete on task_occurrences
+  for each row execute function rollup_task_occurrence_stats();
+
+
+-- Search
+-- Ranked full-text search over task title/description plus trigram
+-- (typo-tolerant) matching on task titles and habit names. search_items()
+-- runs as the caller, so RLS limits results to their own rows. Matches are
+-- wrapped in «» by ts_headline; the app turns those into <mark> tags.
+create extension if not exists pg_trgm;
+
+alter table tasks add column if not exists search_vector tsvector
+  generated always as (to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(description, ''))) stored;
+
+create index if not exists tasks_search_vector_idx on tasks using gin (search_vector);
+create index if not exists tasks_title_trgm_idx on tasks using gin (title gin_trgm_ops);
+create index if not exists habits_name_trgm_idx on habits using gin (name gin_trgm_ops);
+
+create or replace function search_items(p_query text, p_limit int default 20, p_offset int default 0)
+returns table (kind text, id uuid, title text, snippet text, rank real, total bigint)
+language sql stable security invoker set search_path = public as $$
+  with q as (
+    select websearch_to_tsquery('simple', p_query) as tsq
+  ),
+  hits as (
+    select 'task'::text as kind, t.id, t.title, coalesce(t.description, '') as body,
+           greatest(ts_rank(t.search_vector, q.tsq), similarity(t.title, p_query)) as rank
+    from tasks t, q
+    where t.search_vector @@ q.tsq or t.title % p_query or t.title ilike '%' || p_query || '%'
+    union all
+    select 'habit', h.id, h.name, '', similarity(h.name, p_query)
+    from habits h
+    where h.name % p_query or h.name ilike '%' || p_query || '%'
+  ),
+  page as (
+    select hits.*, count(*) over () as total
+    from hits
+    order by rank desc, title
+    limit p_limit offset p_offset
+  )
+  -- ts_headline is expensive, so it only runs on the returned page
+  select page.kind, page.id,
+         ts_headline('simple', page.title, q.tsq, 'StartSel=«, StopSel=», HighlightAll=true'),
+         case when page.body = '' then ''
+              else ts_headline('simple', page.body, q.tsq, 'StartSel=«, StopSel=», MaxWords=24, MinWords=8')
+         end,
+         page.rank::real, page.total
+  from page, q
+  order by page.rank desc, page.title;
+$$;
+
+
+-- Agenda
+-- priority is free text; priority_rank encodes it as a sortable smallint
+-- (0 = high ... 3 = unknown). agenda() returns the next actionable tasks in
+-- (priority_rank, due date, due time, created_at, id) order from one partial
+-- index. Pass the last row's values back as p_after_* to fetch the next page
+-- (keyset pagination), so each page costs O(limit) regardless of task count.
+alter table tasks add column if not exists due_time time;
+alter table tasks add column if not exists priority_rank smallint
+  generated always as (case priority when 'high' then 0 when 'medium' then 1 when 'low' then 2 else 3 end) stored;
+
+create index if not exists tasks_agenda_idx on tasks (
+  user_id, priority_rank, coalesce(due_date, 'infinity'::date), coalesce(due_time, '24:00'::time), created_at, id
+) where status <> 'completed' and recurrence_rule is null;
+
+create or replace function agenda(
+  p_limit int default 10,
+  p_after_rank smallint default null,
+  p_after_due date default null,
+  p_after_time time default null,
+  p_after_created timestamptz default null,
+  p_after_id uuid default null
+) returns setof tasks
+language sql stable security invoker set search_path = public as $$
+  select * from tasks
+  where user_id = auth.uid()
+    and status <> 'completed'
+    and recurrence_rule is null
+    and (p_after_id is null or
+         (priority_rank, coalesce(due_date, 'infinity'::date), coalesce(due_time, '24:00'::time), created_at, id)
+         > (p_after_rank, coalesce(p_after_due, 'infinity'::date), coalesce(p_after_time, '24:00'::time),
+            p_after_created, p_after_id))
+  order by priority_rank, coalesce(due_date, 'infinity'::date), coalesce(due_time, '24:00'::time), created_at, id
+  limit p_limit;
+$$;
+
+
+-- Delta Sync
+-- Every insert/update of a task or habit takes a new value from one global
+-- sequence (revision) and every delete leaves a tombstone in deleted_rows
+-- with its own revision. A client that remembers the highest revision it has
+-- seen fetches only rows and tombstones above it (app/sync.py).
+create sequence if not exists row_revision_seq;
+
+alter table tasks add column if not exists revision bigint not null default nextval('row_revision_seq');
+alter table tasks add column if not exists updated_at timestamptz default now();
+alter table habits add column if not exists revision bigint not null default nextval('row_revision_seq');
+alter table habits add column if not exists updated_at timestamptz default now();
+
+create index if not exists tasks_user_revision_idx on tasks (user_id, revision);
+create index if not exists habits_user_revision_idx on habits (user_id, revision);
+
+create table if not exists deleted_rows (
+  table_name text,
+  row_id uuid,
+  user_id uuid references auth.users(id),
+  revision bigint not null default nextval('row_revision_seq'),
+  deleted_at timestamptz default now(),
+  primary key (table_name, row_id)
+);
+
+create index if not exists deleted_rows_table_user_revision_idx on deleted_rows (table_name, user_id, revision);
+
+alter table deleted_rows enable row level security;
+
+create policy "Users can read their own tombstones" on deleted_rows
+  for select using (auth.uid() = user_id);
+
+create policy "Admins can read all tombstones" on deleted_rows
+  for select using (
+    exists (select 1 from users where id = auth.uid() and role = 'admin')
+  );
+
+create or replace function bump_row_revision() returns trigger
+language plpgsql as $$
+begin
+  new.revision := nextval('row_revision_seq');
+  new.updated_at := now();
+  return new;
+end;
+$$;
+
+create or replace function record_tombstone() returns trigger
+language plpgsql security definer set search_path = public as $$
+begin
+  insert into deleted_rows (table_name, row_id, user_id)
+  values (tg_table_name, old.id, old.user_id)
+  on conflict (table_name, row_id) do update
+    set revision = nextval('row_revision_seq'), deleted_at = now();
+  return null;
+end;
+$$;
+
+drop trigger if exists tasks_bump_revision on tasks;
+create trigger tasks_bump_revision
+  before update on tasks
+  for each row execute function bump_row_revision();
+
+drop trigger if exists habits_bump_revision on habits;
+create trigger habits_bump_revision
+  before update on habits
+  for each row execute function bump_row_revision();
+
+drop trigger if exists tasks_record_tombstone on tasks;
+create trigger tasks_record_tombstone
+  after delete on tasks
+  for each row execute function record_tombstone();
+
+drop trigger if exists habits_record_tombstone on habits;
+create trigger habits_record_tombstone
+  after delete on habits
+  for each row execute function record_tombstone();
+
+-- Tombstones only need to outlive the longest gap between two delta syncs;
+-- clients do a full resync at least every FULL_SYNC_INTERVAL (30 minutes by
+-- default). The reminder worker calls purge_tombstones() once an hour with a
+-- one day retention.
+create index if not exists deleted_rows_deleted_at_idx on deleted_rows (deleted_at);
+
+create or replace function purge_tombstones(p_retention interval default '1 day')
+returns integer
+language plpgsql security definer set search_path = public as $$
+declare
+  purged integer;
+begin
+  delete from deleted_rows where deleted_at < now() - p_retention;
+  get diagnostics purged = row_count;
+  return purged;
+end;
+$$;
+
+revoke execute on function purge_tombstones(interval) from public, anon, authenticated;
+grant execute on function purge_tombstones(interval) to service_role;
+
+
+-- Reminder Outbox
+-- A worker (python -m app.reminder_worker) calls enqueue_due_reminders()
+-- once a minute. One set-based insert finds every habit, for every user,
+-- whose reminder falls within the next hour and that has no log today.
+-- Sessions read only their own pending rows and mark them delivered.
+create table if not exists reminder_outbox (
+  id bigserial primary key,
+  user_id uuid references auth.users(id),
+  habit_id uuid references habits(id) on delete cascade,
+  habit_name text,
+  remind_on date not null,
+  reminder_time time,
+  status text not null default 'pending' check (status in ('pending', 'delivered')),
+  created_at timestamptz default now(),
+  delivered_at timestamptz,
+  unique (habit_id, remind_on)
+);
+
+create index if not exists reminder_outbox_pending_idx on reminder_outbox (user_id) where status = 'pending';
+create index if not exists habits_reminder_time_idx on habits (reminder_time) where reminder_time is not null;
+
+alter table reminder_outbox enable row level security;
+
+create policy "Users can read their own reminders" on reminder_outbox
+  for select using (auth.uid() = user_id);
+
+create policy "Users can mark their own reminders delivered" on reminder_outbox
+  for update using (auth.uid() = user_id) with check (auth.uid() = user_id);
+
+-- p_now is the worker's local wall-clock time, matching how reminder_time is entered.
+-- Windows that would cross midnight stop at the end of the day.
+create or replace function enqueue_due_reminders(p_now timestamp default localtimestamp, p_window interval default '1 hour')
+returns integer
+language plpgsql security definer set search_path = public as $$
+declare
+  window_end time := case when (p_now + p_window)::date > p_now::date then time '23:59:59.999999'
+                          else (p_now + p_window)::time end;
+  queued integer;
+begin
+  insert into reminder_outbox (user_id, habit_id, habit_name, remind_on, reminder_time)
+  select h.user_id, h.id, h.name, p_now::date, h.reminder_time
+  from habits h
+  where h.reminder_time between p_now::time and window_end
+    and not exists (
+      select 1 from habit_logs l where l.habit_id = h.id and l.completed_date = p_now::date
+    )
+  on conflict (habit_id, remind_on) do nothing;
+  get diagnostics queued = row_count;
+
+  delete from reminder_outbox where remind_on < p_now::date - 7;
+  return queued;
+end;
+$$;
+
+revoke execute on function enqueue_due_reminders(timestamp, interval) from public, anon, authenticated;
+grant execute on function enqueue_due_reminders(timestamp, interval) to service_role;
+
+-- Checking in a habit withdraws its reminder if no session has picked it up yet
+create or replace function withdraw_habit_reminder() returns trigger
+language plpgsql security definer set search_path = public as $$
+begin
+  delete from reminder_outbox
+  where habit_id = new.habit_id and remind_on = new.completed_date and status = 'pending';
+  return null;
+end;
+$$;
+
+drop trigger if exists habit_logs_withdraw_reminder on habit_logs;
+create trigger habit_logs_withdraw_reminder
+  after insert on habit_logs
+  for each row execute function withdraw_habit_reminder();
+
+
+-- Period Progress
+-- target_count is how many completions a habit needs per period: the day,
+-- the ISO week (Monday to Sunday) or the calendar month, per its frequency.
+-- habit_period_progress() returns the progress of all the caller's habits
+-- for the periods containing p_today in one aggregate query.
+alter table habits add column if not exists target_count integer not null default 1 check (target_count > 0);
+
+create index if not exists habit_logs_habit_date_idx on habit_logs (habit_id, completed_date);
+
+create or replace function habit_period_progress(p_today date default current_date)
+returns table (habit_id uuid, period_start date, period_end date, done integer, target integer,
+               remaining integer, progress real)
+language sql stable security invoker set search_path = public as $$
+  with periods as (
+    select h.id, h.target_count,
+           case h.frequency when 'weekly' then date_trunc('week', p_today)::date
+                            when 'monthly' then date_trunc('month', p_today)::date
+                            else p_today end as period_start,
+           case h.frequency when 'weekly' then date_trunc('week', p_today)::date + 6
+                            when 'monthly' then (date_trunc('month', p_today) + interval '1 month - 1 day')::date
+                            else p_today end as period_end
+    from habits h
+    where h.user_id = auth.uid()
+  )
+  select p.id, p.period_start, p.period_end, count(l.id)::integer, p.target_count,
+         greatest(p.target_count - count(l.id), 0)::integer,
+         least(count(l.id)::real / p.target_count, 1)::real
+  from periods p
+  left join habit_logs l on l.habit_id = p.id and l.completed_date between p.period_start and p.period_end
+  group by p.id, p.target_count, p.period_start, p.period_end;
+$$;
+
+
+-- Weekly Insights
+-- Written by the batch job (python -m app.insights) with the service role
+-- key, one compact JSON report per user and ISO week ('2026-W42'). The
+-- dashboard reads the latest row with a single primary key range lookup.
+create table if not exists weekly_insights (
+  user_id uuid references auth.users(id) on delete cascade,
+  iso_week text not null,
+  report jsonb not null,
+  computed_at timestamptz not null default now(),
+  primary key (user_id, iso_week)
+);
+
+alter table weekly_insights enable row level security;
+
+create policy "Users can read their own insights" on weekly_insights
+  for select using (auth.uid() = user_id);
+
+-- The job reads each batch of users' recent logs by user and date
+create index if not exists habit_logs_user_date_idx on habit_logs (user_id, completed_date);